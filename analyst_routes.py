@@ -5,25 +5,159 @@ Fixed version with better error handling and workspace discovery
 """
 
 import os
+import re
+import gzip
 import json
+import hashlib
 import logging
 import asyncio
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from aiohttp import web
 from aiohttp.web import Request, Response, json_response
 import aiohttp
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
 # Import components
 from powerbi_client import powerbi_client, WorkspaceInfo, DatasetInfo, QueryResult
-from analyst_translator import analyst_translator, DAXQuery, TranslationContext
+from analyst_translator import analyst_translator, DAXQuery, TranslationContext, DatasetIndex, preload_encoding
 from analysis_agent import analysis_agent, AnalysisContext, InsightResult
 
 # Import UI
-from analyst_ui import get_analyst_html
+from analyst_ui import (
+    get_analyst_html, get_analyst_css, get_analyst_javascript,
+    ANALYST_HTML_VERSION, ANALYST_CSS_VERSION, ANALYST_JS_VERSION,
+    ANALYST_CSS_PATH, ANALYST_JS_PATH
+)
 
 logger = logging.getLogger(__name__)
 
+# Static assets are versioned by content hash, so they can be cached forever
+STATIC_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# The page URL is not versioned, so browsers revalidate it on every load
+PAGE_CACHE_CONTROL = 'no-cache'
+
+# Lets the browser (and any proxy that turns Link into 103 Early Hints) fetch
+# the assets before it has parsed the page
+PAGE_LINK_HEADER = (f'<{ANALYST_CSS_PATH}>; rel=preload; as=style, '
+                    f'<{ANALYST_JS_PATH}>; rel=preload; as=script')
+
+def _precompress(text: str) -> Dict[str, bytes]:
+    """Encode a static page once into every supported content encoding"""
+    raw = text.encode('utf-8')
+    variants = {'identity': raw, 'gzip': gzip.compress(raw, compresslevel=9)}
+    if BROTLI_AVAILABLE:
+        variants['br'] = brotli.compress(raw, quality=11)
+    return variants
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into encoding -> q-value"""
+    accepted = {}
+    for token in accept_encoding.lower().split(','):
+        name, _, params = token.partition(';')
+        name = name.strip()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+def _negotiate_encoding(accept_encoding: str, variants: Dict[str, bytes]) -> str:
+    """Pick the best precompressed variant the client accepts, honouring q=0"""
+    accepted = _accepted_encodings(accept_encoding)
+    best, best_quality = 'identity', 0.0
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in variants and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+# Entity tags in an If-None-Match list (weak or strong), or the * wildcard
+_ETAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header (RFC 9110)"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in _ETAG_RE.findall(if_none_match):
+        if candidate == '*' or (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+def _list_etag(items: List[Dict[str, Any]]) -> str:
+    """Strong ETag for a JSON list, so clients can revalidate cached copies"""
+    payload = json.dumps(items, sort_keys=True, default=str).encode('utf-8')
+    return f'"{hashlib.sha256(payload).hexdigest()[:16]}"'
+
+# Recent questions kept per session as translation context
+QUERY_HISTORY_LIMIT = 20
+
+# Query results can be streamed as newline-delimited JSON when the client asks
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+NDJSON_ROWS_PER_LINE = 500
+
+def _wants_ndjson(request: Request) -> bool:
+    """Check whether the client accepts a streamed NDJSON result"""
+    return NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+
+def _row_events(rows: List[Dict[str, Any]]):
+    """Yield result rows in batches of NDJSON_ROWS_PER_LINE"""
+    for start in range(0, len(rows), NDJSON_ROWS_PER_LINE):
+        yield {"type": "rows", "rows": rows[start:start + NDJSON_ROWS_PER_LINE]}
+
+def _result_events(meta: Dict[str, Any], rows: List[Dict[str, Any]]):
+    """Yield a result as a meta line, row batches and an end marker"""
+    yield {"type": "meta", **meta}
+    yield from _row_events(rows)
+    yield {"type": "end"}
+
+# Only the first rows of a result are sent as JSON; the full count goes alongside
+PREVIEW_ROWS = int(os.environ.get("ANALYST_PREVIEW_ROWS", "1000"))
+
+def _column_types(rows: List[Dict[str, Any]]) -> List[str]:
+    """Classify each column as 'number' or 'string' so the client formats per column"""
+    if not rows:
+        return []
+    types = []
+    for column in rows[0]:
+        values = [row.get(column) for row in rows if row.get(column) is not None]
+        numeric = bool(values) and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        )
+        types.append("number" if numeric else "string")
+    return types
+
+def _result_preview(rows: Optional[List[Dict[str, Any]]], row_count: int) -> Dict[str, Any]:
+    """Slice a result to the preview size and describe what was left out"""
+    rows = rows or []
+    preview = rows[:PREVIEW_ROWS]
+    return {
+        "preview": preview,
+        "row_count": row_count,
+        "truncated": row_count > len(preview),
+        "column_types": _column_types(preview)
+    }
+
+_HTML_VARIANTS = _precompress(get_analyst_html())
+_CSS_VARIANTS = _precompress(get_analyst_css())
+_JS_VARIANTS = _precompress(get_analyst_javascript())
+
 class PowerBIAnalyst:
     """Power BI Analyst endpoint handler"""
     
@@ -45,8 +179,54 @@ class PowerBIAnalyst:
     
     async def analyst_page(self, request: Request) -> Response:
         """Serve the analyst HTML page"""
-        html_content = get_analyst_html()
-        return Response(text=html_content, content_type='text/html')
+        return self._static_asset(request, _HTML_VARIANTS, 'text/html', 
+                                  ANALYST_HTML_VERSION, PAGE_CACHE_CONTROL,
+                                  {'Link': PAGE_LINK_HEADER})
+    
+    async def analyst_css(self, request: Request) -> Response:
+        """Serve the analyst stylesheet"""
+        return self._static_asset(request, _CSS_VARIANTS, 'text/css', ANALYST_CSS_VERSION)
+    
+    async def analyst_js(self, request: Request) -> Response:
+        """Serve the analyst JavaScript"""
+        return self._static_asset(request, _JS_VARIANTS, 'application/javascript', ANALYST_JS_VERSION)
+    
+    def _static_asset(self, request: Request, variants: Dict[str, bytes], content_type: str, 
+                      version: str, cache_control: str = STATIC_CACHE_CONTROL,
+                      extra_headers: Optional[Dict[str, str]] = None) -> Response:
+        """Build a cacheable response for a static page or asset, honouring If-None-Match"""
+        encoding = _negotiate_encoding(request.headers.get('Accept-Encoding', ''), variants)
+        etag = f'"{version}-{encoding}"'
+        # The ETag depends on the encoding, so the 304 must vary on it too
+        headers = {'Cache-Control': cache_control, 'ETag': etag, 'Vary': 'Accept-Encoding',
+                   **(extra_headers or {})}
+        
+        if _etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        
+        return self._encoded_response(request, variants, content_type, headers, encoding)
+    
+    def _encoded_response(self, request: Request, variants: Dict[str, bytes], content_type: str,
+                          headers: Optional[Dict[str, str]] = None,
+                          encoding: Optional[str] = None) -> Response:
+        """Serve the precompressed variant matching the client's Accept-Encoding"""
+        if encoding is None:
+            encoding = _negotiate_encoding(request.headers.get('Accept-Encoding', ''), variants)
+        
+        headers = dict(headers or {})
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        
+        return Response(body=variants[encoding], content_type=content_type, 
+                        charset='utf-8', headers=headers)
+    
+    def _list_response(self, request: Request, etag: str, data: Dict[str, Any]) -> Response:
+        """Return a list payload, or 304 when the client's copy is still current"""
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        return json_response(data, headers=headers)
     
     async def check_configuration(self, request: Request) -> Response:
         """API endpoint to check Power BI configuration"""
@@ -69,6 +249,15 @@ class PowerBIAnalyst:
     async def get_workspaces(self, request: Request) -> Response:
         """API endpoint to get user's Power BI workspaces"""
         try:
+            # The page learns whether Power BI is configured from this response,
+            # so startup needs no separate (and much slower) configuration check
+            if not self.powerbi_client.is_configured():
+                return json_response({
+                    "status": "error",
+                    "configured": False,
+                    "error": "Power BI is not configured"
+                })
+            
             # Clear cache if requested
             if request.query.get('refresh', '').lower() == 'true':
                 logger.info("Clearing workspace cache due to refresh request")
@@ -234,7 +423,7 @@ class PowerBIAnalyst:
                 cached_data = self.dataset_cache[cache_key]
                 if cached_data["expires"] > datetime.now().timestamp():
                     logger.info(f"Returning cached datasets for workspace {workspace_name}")
-                    return json_response({
+                    return self._list_response(request, cached_data["etag"], {
                         "status": "success",
                         "datasets": cached_data["data"],
                         "cached": True
@@ -258,8 +447,10 @@ class PowerBIAnalyst:
                 logger.info(f"Dataset: {ds.name}")
             
             # Cache the results
+            etag = _list_etag(dataset_list)
             self.dataset_cache[cache_key] = {
                 "data": dataset_list,
+                "etag": etag,
                 "expires": datetime.now().timestamp() + self.cache_duration
             }
             
@@ -281,7 +472,7 @@ class PowerBIAnalyst:
                     ]
                 }
             
-            return json_response(response_data)
+            return self._list_response(request, etag, response_data)
             
         except Exception as e:
             logger.error(f"Error getting datasets: {e}", exc_info=True)
@@ -344,7 +535,8 @@ class PowerBIAnalyst:
                 business_context={
                     "dataset_id": dataset_id,
                     "dataset_name": dataset_name
-                }
+                },
+                index=self._dataset_index(dataset_id, metadata)
             )
             
             # Add to query history
@@ -353,7 +545,7 @@ class PowerBIAnalyst:
             
             # Translate to DAX
             logger.info("Translating natural language to DAX...")
-            dax_result = await self.translator.translate_to_dax(query, context)
+            dax_result = await self.translator.translate_with_speculation(query, context)
             
             if dax_result.error:
                 return json_response({
@@ -402,39 +594,14 @@ class PowerBIAnalyst:
             # Log successful execution
             logger.info(f"Query executed successfully. Rows returned: {query_result.row_count}")
             
-            # Perform progressive analysis
-            logger.info("Performing progressive analysis...")
-            try:
-                insight_result = await self.analysis_agent.perform_progressive_analysis(
-                    query,
-                    query_result,
-                    metadata,
-                    self.powerbi_client,
-                    token
-                )
-                
-                insights_data = {
-                    "summary": insight_result.summary,
-                    "insights": insight_result.insights,
-                    "recommendations": insight_result.recommendations,
-                    "confidence": insight_result.confidence,
-                    "investigation_complete": insight_result.investigation_complete
-                }
-            except Exception as e:
-                logger.error(f"Error in progressive analysis: {e}")
-                insights_data = {
-                    "summary": "Analysis completed",
-                    "insights": ["Query executed successfully"],
-                    "recommendations": [],
-                    "confidence": 0.5,
-                    "investigation_complete": True
-                }
+            # Streaming clients get the rows before the analysis runs
+            if _wants_ndjson(request):
+                return await self._ndjson_response(request, self._stream_analysis(
+                    request, query, dax_result, query_result, metadata, token, session_id
+                ))
             
-            # Update session history
-            if session_id:
-                if session_id not in self.sessions:
-                    self.sessions[session_id] = {"query_history": []}
-                self.sessions[session_id]["query_history"].append(query)
+            insights_data = await self._analyze_result(query, query_result, metadata, token)
+            self._remember_query(session_id, query)
             
             # Format response
             response_data = {
@@ -443,8 +610,7 @@ class PowerBIAnalyst:
                 "original_query": query,
                 "dax_query": dax_result.query,
                 "explanation": dax_result.explanation,
-                "data": query_result.data,
-                "row_count": query_result.row_count,
+                **_result_preview(query_result.data, query_result.row_count),
                 "execution_time_ms": query_result.execution_time_ms,
                 "insights": insights_data,
                 "follow_up_queries": self._generate_follow_up_suggestions(query, insights_data)
@@ -460,6 +626,109 @@ class PowerBIAnalyst:
                 "error_type": type(e).__name__
             })
     
+    async def _stream_analysis(self, request: Request, query: str, dax_result: DAXQuery,
+                               query_result: QueryResult, metadata: Dict[str, Any], token: str,
+                               session_id: Optional[str]):
+        """Yield the query result first and the insights once the analysis finishes"""
+        preview = _result_preview(query_result.data, query_result.row_count)
+        rows = preview.pop("preview")
+        
+        yield {
+            "type": "meta",
+            "status": "success",
+            "query_type": "analysis_complete",
+            "original_query": query,
+            "dax_query": dax_result.query,
+            "explanation": dax_result.explanation,
+            "execution_time_ms": query_result.execution_time_ms,
+            # Rows arrive in several batches, so tell the page how many to expect
+            "preview_rows": len(rows),
+            **preview
+        }
+        for event in _row_events(rows):
+            yield event
+        
+        # The page aborts a question it no longer wants; skip the analysis then
+        if request.transport is None or request.transport.is_closing():
+            logger.info("Client went away before analysis; skipping insights")
+            return
+        
+        insights_data = await self._analyze_result(query, query_result, metadata, token)
+        self._remember_query(session_id, query)
+        
+        yield {
+            "type": "insights",
+            "insights": insights_data,
+            "follow_up_queries": self._generate_follow_up_suggestions(query, insights_data)
+        }
+        yield {"type": "end"}
+    
+    async def _analyze_result(self, query: str, query_result: QueryResult,
+                              metadata: Dict[str, Any], token: str) -> Dict[str, Any]:
+        """Run the progressive analysis, falling back to a minimal summary on failure"""
+        logger.info("Performing progressive analysis...")
+        try:
+            insight_result = await self.analysis_agent.perform_progressive_analysis(
+                query,
+                query_result,
+                metadata,
+                self.powerbi_client,
+                token
+            )
+            
+            return {
+                "summary": insight_result.summary,
+                "insights": insight_result.insights,
+                "recommendations": insight_result.recommendations,
+                "confidence": insight_result.confidence,
+                "investigation_complete": insight_result.investigation_complete
+            }
+        except Exception as e:
+            logger.error(f"Error in progressive analysis: {e}")
+            return {
+                "summary": "Analysis completed",
+                "insights": ["Query executed successfully"],
+                "recommendations": [],
+                "confidence": 0.5,
+                "investigation_complete": True
+            }
+    
+    def _remember_query(self, session_id: Optional[str], query: str):
+        """Record a query in the session history used as translation context"""
+        if session_id:
+            if session_id not in self.sessions:
+                self.sessions[session_id] = {"query_history": deque(maxlen=QUERY_HISTORY_LIMIT)}
+            self.sessions[session_id]["query_history"].append(query)
+    
+    async def prefetch_metadata(self, request: Request) -> Response:
+        """API endpoint to warm the metadata cache for a dataset the user just selected"""
+        try:
+            data = await request.json()
+            dataset_id = data.get('dataset_id')
+            
+            if not dataset_id:
+                return json_response({
+                    "status": "error",
+                    "error": "dataset_id is required"
+                })
+            
+            token = await self.powerbi_client.get_access_token()
+            if not token:
+                return json_response({
+                    "status": "error",
+                    "error": "Failed to authenticate with Power BI"
+                })
+            
+            await self._get_dataset_metadata(token, dataset_id)
+            return json_response({"status": "success"})
+            
+        except Exception as e:
+            logger.error(f"Error prefetching metadata: {e}")
+            return json_response({
+                "status": "error",
+                "error": str(e)
+            })
+    
     async def execute_dax(self, request: Request) -> Response:
         """Direct DAX execution endpoint (for fixed queries)"""
         try:
@@ -494,10 +763,20 @@ class PowerBIAnalyst:
             
             if result.success:
                 logger.info(f"Direct DAX execution successful. Rows: {result.row_count}")
+                
+                if _wants_ndjson(request):
+                    preview = _result_preview(result.data, result.row_count)
+                    rows = preview.pop("preview")
+                    return await self._ndjson_response(request, _result_events({
+                        "status": "success",
+                        "execution_time_ms": result.execution_time_ms,
+                        "preview_rows": len(rows),
+                        **preview
+                    }, rows))
+                
                 return json_response({
                     "status": "success",
-                    "data": result.data,
-                    "row_count": result.row_count,
+                    **_result_preview(result.data, result.row_count),
                     "execution_time_ms": result.execution_time_ms
                 })
             else:
@@ -514,6 +793,42 @@ class PowerBIAnalyst:
                 "error": str(e)
             })
     
+    async def _ndjson_response(self, request: Request, events) -> web.StreamResponse:
+        """Stream events to the client, one JSON document per line"""
+        response = web.StreamResponse(headers={
+            'Content-Type': NDJSON_CONTENT_TYPE,
+            'Cache-Control': 'no-cache'
+        })
+        await response.prepare(request)
+        
+        async def write(event):
+            await response.write(json.dumps(event, default=str).encode('utf-8') + b'\n')
+        
+        try:
+            # Events come from a plain generator, or an async one when later
+            # events are still being computed while the first are sent
+            if hasattr(events, '__aiter__'):
+                async for event in events:
+                    await write(event)
+            else:
+                for event in events:
+                    await write(event)
+            await response.write_eof()
+        except ConnectionResetError:
+            # The page aborted a superseded request
+            logger.info("Client disconnected while streaming results")
+        except Exception as e:
+            # The headers are already sent, so report the failure in the stream
+            logger.error(f"Error while streaming results: {e}", exc_info=True)
+            try:
+                await write({"type": "error", "error": str(e), "error_type": type(e).__name__})
+                await write({"type": "end"})
+                await response.write_eof()
+            except ConnectionResetError:
+                logger.info("Client disconnected while streaming results")
+        
+        return response
+    
     async def test_connection(self, request: Request) -> Response:
         """Test Power BI connection and configuration"""
         try:
@@ -615,6 +930,17 @@ class PowerBIAnalyst:
         
         return metadata
     
+    def _dataset_index(self, dataset_id: str, metadata: Dict[str, Any]) -> DatasetIndex:
+        """Return the translation index for a dataset, kept alongside its cached metadata"""
+        cached_data = self.dataset_cache.get(f"metadata_{dataset_id}")
+        if cached_data is None or cached_data["data"] is not metadata:
+            # Metadata that was not cached (e.g. a failed fetch) gets a throwaway index
+            return DatasetIndex(metadata.get("measures", []), metadata.get("tables", []))
+        
+        if "index" not in cached_data:
+            cached_data["index"] = DatasetIndex(metadata.get("measures", []), metadata.get("tables", []))
+        return cached_data["index"]
+    
     def _generate_follow_up_suggestions(self, original_query: str, insights: Dict[str, Any]) -> List[Dict[str, str]]:
         """Generate follow-up query suggestions based on the analysis"""
         suggestions = []
@@ -686,6 +1012,10 @@ class PowerBIAnalyst:
         # Limit to 3 suggestions
         return suggestions[:3]
 
+async def _preload_encoding(app):
+    """Load the translator's tokenizer before the first request needs it"""
+    await preload_encoding()
+
 def add_analyst_routes(app, sql_translator=None):
     """Add Power BI Analyst routes to the application"""
     
@@ -695,13 +1025,20 @@ def add_analyst_routes(app, sql_translator=None):
     app.router.add_get('/analyst', analyst.analyst_page)
     app.router.add_get('/analyst/', analyst.analyst_page)
     
+    # Static assets, named by content hash so they can be cached forever
+    app.router.add_get(ANALYST_CSS_PATH, analyst.analyst_css)
+    app.router.add_get(ANALYST_JS_PATH, analyst.analyst_js)
+    
     # API endpoints
     app.router.add_get('/analyst/api/check-config', analyst.check_configuration)
     app.router.add_get('/analyst/api/workspaces', analyst.get_workspaces)
     app.router.add_get('/analyst/api/datasets', analyst.get_datasets)
+    app.router.add_post('/analyst/api/prefetch-metadata', analyst.prefetch_metadata)
     app.router.add_post('/analyst/api/analyze', analyst.analyze_query)
     app.router.add_post('/analyst/api/execute-dax', analyst.execute_dax)
     app.router.add_get('/analyst/api/test-connection', analyst.test_connection)
     
+    app.on_startup.append(_preload_encoding)
+    
     logger.info("Power BI Analyst routes added successfully")
     return analyst
\ No newline at end of file
@@ -4,15 +4,300 @@ Analyst Translator - Converts natural language business queries to DAX queries
 """
 
 import os
+import re
 import json
+import time
+import heapq
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List, Tuple
-from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Any, Optional, List, Tuple, Callable, FrozenSet, AsyncIterator, Iterable
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from openai import AzureOpenAI
+from types import MappingProxyType
+from json.decoder import scanstring
+import httpx
+from openai import AsyncAzureOpenAI
+
+# Handle tiktoken import with fallback to fixed-size samples
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# Handle orjson import with fallback to stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# HTTP connection pool settings for Azure OpenAI calls. The SDK retries
+# 429/5xx/timeouts with exponential backoff and honors Retry-After headers.
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+_MAX_RETRIES = 5
+
+# Structured outputs (strict JSON schema) need API version 2024-08-01-preview or
+# later (the GA 2024-10-21 default supports them) and a model that supports them;
+# set ANALYST_STRUCTURED_OUTPUTS=false to fall back to plain JSON mode on older deployments
+_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-10-21")
+STRUCTURED_OUTPUTS = os.environ.get("ANALYST_STRUCTURED_OUTPUTS", "true").lower() == "true"
+
+_DAX_QUERY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {"type": "string"},
+        "explanation": {"type": "string"},
+        "measures_used": {"type": "array", "items": {"type": "string"}},
+        "tables_referenced": {"type": "array", "items": {"type": "string"}},
+        "confidence": {"type": "number"},
+        "requires_time_intelligence": {"type": "boolean"}
+    },
+    "required": ["query", "explanation", "measures_used", "tables_referenced",
+                 "confidence", "requires_time_intelligence"],
+    "additionalProperties": False
+}
+
+_ERROR_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "error_type": {
+            "type": "string",
+            "enum": ["syntax", "measure_not_found", "column_not_found", "context", "other"]
+        },
+        "explanation": {"type": "string"},
+        "fixed_query": {"type": "string"},
+        "confidence": {"type": "number"},
+        "alternative_approaches": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["error_type", "explanation", "fixed_query", "confidence", "alternative_approaches"],
+    "additionalProperties": False
+}
+
+def _warn_if_schema_rejected(error: Exception):
+    """Log a warning when a call failed because the deployment rejected the JSON schema"""
+    message = str(error)
+    if STRUCTURED_OUTPUTS and ("json_schema" in message or "response_format" in message):
+        logger.warning(
+            "Deployment rejected structured outputs; falling back. Use a model and API version "
+            "that support json_schema, or set ANALYST_STRUCTURED_OUTPUTS=false"
+        )
+
+def _response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the response_format for a structured (or plain JSON) response"""
+    if not STRUCTURED_OUTPUTS:
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+_DAX_RESPONSE_FORMAT = _response_format("DAXQuery", _DAX_QUERY_SCHEMA)
+_ERROR_RESPONSE_FORMAT = _response_format("DAXErrorAnalysis", _ERROR_ANALYSIS_SCHEMA)
+
+# Speculative retry: for low-confidence translations, fire a self-critique and an
+# alternative translation concurrently and keep the most confident result
+# (opt-in: each low-confidence translation costs two extra model calls)
+SPECULATIVE_RETRY = os.environ.get("ANALYST_SPECULATIVE_RETRY", "false").lower() == "true"
+SPECULATION_THRESHOLD = float(os.environ.get("ANALYST_SPECULATION_THRESHOLD", "0.5"))
+
+# Token budgets for the dynamic measure/table samples in the user message
+_MEASURES_TOKEN_BUDGET = 800
+_TABLES_TOKEN_BUDGET = 300
+_SEPARATOR_TOKENS = 1  # ", "
+
+# Maximum number of query-relevant measures moved to the front of the sample
+_RELEVANT_MEASURES_MAX = 30
+
+# Tokenizer for budget-aware sampling. Loading may download the BPE file, so it
+# runs at startup (or in the executor) and is retried after a failed attempt
+_ENCODING_RETRY_SECONDS = 300
+_encoding = None
+_encoding_loading = False
+_encoding_retry_at = 0.0
+
+def _load_encoding():
+    """Load the tiktoken encoding for the configured deployment (blocking)"""
+    global _encoding, _encoding_loading, _encoding_retry_at
+    try:
+        model = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        try:
+            _encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Custom deployment names are not known to tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        _encoding_retry_at = time.monotonic() + _ENCODING_RETRY_SECONDS
+        logger.warning(f"Token counting unavailable, using fixed samples: {e}")
+    finally:
+        _encoding_loading = False
+    return _encoding
+
+async def preload_encoding():
+    """Load the tokenizer in the executor so requests never wait on it"""
+    global _encoding_loading
+    if not TIKTOKEN_AVAILABLE or _encoding is not None or _encoding_loading:
+        return
+    _encoding_loading = True
+    await asyncio.get_running_loop().run_in_executor(None, _load_encoding)
+
+def _get_encoding():
+    """Return the tiktoken encoding, or None while it is unavailable
+    
+    Never blocks the event loop: when the encoding is not loaded yet (or a
+    retry is due after a failure), loading is scheduled in the executor and
+    callers use fixed-size samples in the meantime.
+    """
+    global _encoding_loading
+    if _encoding is not None or not TIKTOKEN_AVAILABLE:
+        return _encoding
+    if _encoding_loading or time.monotonic() < _encoding_retry_at:
+        return None
+    
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _load_encoding()
+    _encoding_loading = True
+    loop.run_in_executor(None, _load_encoding)
+    return None
+
+def _encoding_pending() -> bool:
+    """True while tiktoken is installed but its encoding has not loaded (yet)"""
+    return TIKTOKEN_AVAILABLE and _encoding is None
+
+def _take_within_budget(items: Iterable[str], budget: int, fallback_count: int) -> List[str]:
+    """Greedily take items in order until their token count reaches the budget"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return list(islice(items, fallback_count))
+    
+    taken = []
+    used = 0
+    for item in items:
+        used += len(encoding.encode_ordinary(item)) + _SEPARATOR_TOKENS
+        if used > budget:
+            break
+        taken.append(item)
+    return taken
+
+# Shared keep-alive HTTP client, created on first use
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared pooled HTTP client for Azure OpenAI requests"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+    return _http_client
+
+# Sentinel for lazily-initialized attributes
+_UNSET = object()
+
+# Precompiled patterns and keyword sets for the pattern-based fallback
+_NUM_RE = re.compile(r'\b(\d+)\b')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+# Single compiled intent matcher; alternatives are tried in priority order and
+# the matching intent is reported via the name of the (empty) group that matched
+_INTENT_RE = re.compile(
+    r'^(?:'
+    r'(?=.*\btop\b)(?=.*\b(?:revenue|sales|customers?)\b)(?P<topn>)'
+    r'|(?=.*\b(?:compare|vs|versus|last\s+year)\b)(?P<cmp>)'
+    r')',
+    re.IGNORECASE | re.DOTALL
+)
+_QUERY_FIELD_RE = re.compile(r'"query"\s*:\s*"')
+_SUMMARY_MEASURES = (
+    ("revenue", '"Total Revenue", [Total Revenue]'),
+    ("customer", '"Customer Count", [Customer Count]'),
+    ("profit", '"Total Profit", [Total Profit]'),
+)
+
+# Follow-up suggestions per query type (shared, never mutated)
+_FOLLOWUP_SUGGESTIONS: Dict[str, Tuple[Dict[str, str], ...]] = {
+    "revenue": (
+        {
+            "question": "What are the top contributing products?",
+            "purpose": "Identify revenue drivers"
+        },
+        {
+            "question": "How does this compare to last year?",
+            "purpose": "Year-over-year comparison"
+        },
+        {
+            "question": "Which regions are underperforming?",
+            "purpose": "Geographic analysis"
+        }
+    ),
+    "customer": (
+        {
+            "question": "What is the customer retention rate?",
+            "purpose": "Loyalty analysis"
+        },
+        {
+            "question": "Which customer segments are most valuable?",
+            "purpose": "Segmentation analysis"
+        },
+        {
+            "question": "What is the average customer lifetime value?",
+            "purpose": "Value analysis"
+        }
+    ),
+    "cost": (
+        {
+            "question": "What are the main cost drivers?",
+            "purpose": "Cost analysis"
+        },
+        {
+            "question": "How has efficiency changed over time?",
+            "purpose": "Trend analysis"
+        },
+        {
+            "question": "Which departments have the highest costs?",
+            "purpose": "Departmental analysis"
+        }
+    )
+}
+
+# Keywords selecting each follow-up query type, checked in order
+_FOLLOWUP_INTENTS: Dict[str, FrozenSet[str]] = {
+    "revenue": frozenset({"revenue"}),
+    "customer": frozenset({"customer"}),
+    "cost": frozenset({"efficiency", "cost", "expense"})
+}
+
+def _tokenize(query_lower: str) -> FrozenSet[str]:
+    """Split a lowercased query into a set of words (plurals folded)"""
+    words = _WORD_RE.findall(query_lower)
+    tokens = set(words)
+    tokens.update(w[:-1] for w in words if len(w) > 3 and w.endswith("s"))
+    return frozenset(tokens)
+
+def _log_cached_tokens(label: str, usage: Any):
+    """Log how many prompt tokens were served from the provider's prefix cache"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached is not None:
+        logger.info(f"{label}: {cached}/{usage.prompt_tokens} prompt tokens cached")
+
+def _extract_query_field(content: str) -> Optional[str]:
+    """Return the "query" string from a partially streamed JSON object once it is complete"""
+    match = _QUERY_FIELD_RE.search(content)
+    if not match:
+        return None
+    try:
+        value, _ = scanstring(content, match.end())
+    except ValueError:
+        # String not terminated yet
+        return None
+    return value
+
 @dataclass
 class DAXQuery:
     """Represents a translated DAX query"""
@@ -23,6 +308,144 @@ class DAXQuery:
     confidence: float
     requires_time_intelligence: bool
     error: Optional[str] = None
+    partial: bool = False
+
+# DAXQuery fields the model may fill in, and their defaults when omitted
+_DAXQUERY_FIELDS = frozenset(f.name for f in fields(DAXQuery)) - {"query", "error", "partial"}
+_DAXQUERY_DEFAULTS = MappingProxyType({
+    "explanation": "",
+    "measures_used": (),
+    "tables_referenced": (),
+    "confidence": 0.8,
+    "requires_time_intelligence": False
+})
+
+def _dax_query_from_result(query: str, result: Dict[str, Any]) -> DAXQuery:
+    """Build a DAXQuery from a parsed model response, applying defaults"""
+    values = {**_DAXQUERY_DEFAULTS, **{k: v for k, v in result.items() if k in _DAXQUERY_FIELDS}}
+    values["measures_used"] = list(values["measures_used"])
+    values["tables_referenced"] = list(values["tables_referenced"])
+    values["confidence"] = float(values["confidence"])
+    return DAXQuery(query=query, **values)
+
+@dataclass(eq=False)
+class DatasetIndex:
+    """Lookup data derived from one dataset's measure and table lists
+    
+    Contexts are built per request, so anything derived from the metadata
+    lives here instead and is shared by every context for the same dataset.
+    """
+    measures: List[str]
+    tables: List[str]
+    
+    # Deduplicated, sorted names so error-analysis prompts are stable across calls
+    sorted_measures: List[str] = field(default_factory=list, init=False, repr=False)
+    sorted_tables: List[str] = field(default_factory=list, init=False, repr=False)
+    
+    # Memoized prompt fragments, built on first use
+    measures_sample_str: Optional[str] = field(default=None, init=False, repr=False)
+    error_measures_str: Optional[str] = field(default=None, init=False, repr=False)
+    tables_sample_str: Optional[str] = field(default=None, init=False, repr=False)
+    error_tables_str: Optional[str] = field(default=None, init=False, repr=False)
+    measure_tokens: Optional[Dict[str, FrozenSet[str]]] = field(default=None, init=False, repr=False)
+    unbracketed_re: Any = field(default=_UNSET, init=False, repr=False)
+    # Token count per measure (bracketed, separator included), filled as measures are sampled
+    token_counts: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    
+    def __post_init__(self):
+        self.invalidate()
+    
+    def measures_sample(self) -> str:
+        """Return the default measures sample, sampled up to a token budget
+        
+        Budgeting by tokens rather than a fixed count keeps long names from
+        pushing the request past the model context. The fixed-count fallback
+        used while the tokenizer is still loading is not memoized.
+        """
+        if self.measures_sample_str is not None:
+            return self.measures_sample_str
+        sample = self.measures_within_budget(self.measures)
+        if not _encoding_pending():
+            self.measures_sample_str = sample
+        return sample
+    
+    def tables_sample(self) -> str:
+        """Return the tables sample, sampled up to a token budget (see measures_sample)"""
+        if self.tables_sample_str is not None:
+            return self.tables_sample_str
+        sample = ', '.join(_take_within_budget(self.tables, _TABLES_TOKEN_BUDGET, 20))
+        if not _encoding_pending():
+            self.tables_sample_str = sample
+        return sample
+    
+    def error_samples(self) -> Tuple[str, str]:
+        """Return the sorted measure and table lists used in error-analysis prompts"""
+        if self.error_measures_str is None:
+            self.error_measures_str = ', '.join(self.sorted_measures[:20])
+            self.error_tables_str = ', '.join(self.sorted_tables[:20])
+        return self.error_measures_str, self.error_tables_str
+    
+    def invalidate(self):
+        """Rebuild derived data after the measure or table lists were mutated"""
+        self.sorted_measures = sorted(set(self.measures))
+        self.sorted_tables = sorted(set(self.tables))
+        self.measures_sample_str = None
+        self.error_measures_str = None
+        self.tables_sample_str = None
+        self.error_tables_str = None
+        self.measure_tokens = None
+        self.unbracketed_re = _UNSET
+        self.token_counts = {}
+    
+    def measures_within_budget(self, ranked: Iterable[str]) -> str:
+        """Join measures in the given order until the measures token budget is reached
+        
+        Each name is encoded at most once per dataset, and only names that are
+        reached before the budget runs out are encoded at all.
+        """
+        encoding = _get_encoding()
+        if encoding is None:
+            return ', '.join(f'[{m}]' for m in islice(ranked, 30))
+        
+        counts = self.token_counts
+        taken = []
+        used = 0
+        for m in ranked:
+            count = counts.get(m)
+            if count is None:
+                count = counts[m] = len(encoding.encode_ordinary(f'[{m}]')) + _SEPARATOR_TOKENS
+            used += count
+            if used > _MEASURES_TOKEN_BUDGET:
+                break
+            taken.append(f'[{m}]')
+        return ', '.join(taken)
+    
+    def unbracketed_measure_re(self) -> Optional[re.Pattern]:
+        """Return a pattern matching any measure name not wrapped in [ ], or None
+        
+        Compiling the alternation is far slower than one validation pass, so
+        it only pays off because the pattern is kept for the dataset.
+        """
+        if self.unbracketed_re is _UNSET:
+            if self.measures:
+                names = sorted(set(self.measures), key=len, reverse=True)
+                self.unbracketed_re = re.compile(
+                    r'(?<!\[)(?:' + '|'.join(map(re.escape, names)) + r')(?!\])'
+                )
+            else:
+                self.unbracketed_re = None
+        return self.unbracketed_re
+    
+    def measure_word_sets(self) -> Dict[str, FrozenSet[str]]:
+        """Return the lower-cased word set of every measure name, used for ranking"""
+        if self.measure_tokens is None:
+            self.measure_tokens = {m: _tokenize(m.lower()) for m in self.measures}
+        return self.measure_tokens
+
+@lru_cache(maxsize=32)
+def _business_line(fiscal_year_start: str, currency: str) -> str:
+    """Business-context lines of the user message (one string per setting pair)"""
+    return f"- Fiscal year starts in {fiscal_year_start}\n- Default currency is {currency}"
 
 @dataclass
 class TranslationContext:
@@ -32,36 +455,37 @@ class TranslationContext:
     available_tables: List[str]
     business_context: Dict[str, Any]
     query_history: List[str] = field(default_factory=list)
-
-class AnalystTranslator:
-    """Translates natural language queries to DAX using Azure OpenAI"""
+    # Shared per-dataset index; a private one is built when none is given
+    index: Optional[DatasetIndex] = field(default=None, repr=False, compare=False)
     
-    def __init__(self):
-        # Azure OpenAI configuration (reuse from main translator)
-        self.endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "").rstrip("/")
-        self.api_key = os.environ.get("AZURE_OPENAI_API_KEY", "")
-        self.deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
-        
-        if not self.endpoint or not self.api_key:
-            logger.warning("Azure OpenAI not configured for analyst translator")
-            self.client = None
-        else:
-            self.client = AzureOpenAI(
-                azure_endpoint=self.endpoint,
-                api_key=self.api_key,
-                api_version="2024-02-01"
-            )
+    def __post_init__(self):
+        if self.index is None:
+            self.index = DatasetIndex(self.available_measures, self.available_tables)
+    
+    def measures_sample_for(self, query: str) -> str:
+        """Return the measures sample for a query, most relevant measures first
         
-        # System prompts
-        self.system_prompt = self._create_system_prompt()
-        self.error_analysis_prompt = self._create_error_analysis_prompt()
+        Measures are ranked by word overlap with the query (ties keep their
+        original order), so relevant measures are not lost to an arbitrary
+        slice. Falls back to the cached default sample when nothing overlaps.
+        """
+        query_tokens = _tokenize(query.lower())
+        scores = {m: len(query_tokens & tokens) for m, tokens in self.index.measure_word_sets().items()}
+        relevant = [m for m in self.available_measures if scores[m]]
+        if not relevant:
+            return self.index.measures_sample()
         
-        # Common DAX patterns
-        self.dax_patterns = self._load_dax_patterns()
+        top = heapq.nlargest(_RELEVANT_MEASURES_MAX, relevant, key=scores.__getitem__)
+        chosen = set(top)
+        ranked = chain(top, (m for m in self.available_measures if m not in chosen))
+        return self.index.measures_within_budget(ranked)
     
-    def _create_system_prompt(self) -> str:
-        """Create the system prompt for DAX translation"""
-        return """You are an expert Power BI DAX query translator specializing in business analytics.
+    def invalidate_samples(self):
+        """Drop cached sample strings after mutating the measure or table lists"""
+        self.index.invalidate()
+
+# System prompt for DAX translation (kept byte-identical across requests for prefix caching)
+_SYSTEM_PROMPT = """You are an expert Power BI DAX query translator specializing in business analytics.
 Your role is to convert natural language business questions into accurate, efficient DAX queries.
 
 CONTEXT:
@@ -99,9 +523,8 @@ Always respond with a JSON object containing:
     "requires_time_intelligence": true/false
 }"""
 
-    def _create_error_analysis_prompt(self) -> str:
-        """Create the error analysis prompt for DAX errors"""
-        return """You are an expert Power BI DAX debugger helping business users fix query errors.
+# Error analysis prompt for DAX errors
+_ERROR_ANALYSIS_PROMPT = """You are an expert Power BI DAX debugger helping business users fix query errors.
 Analyze DAX errors and provide corrected queries that work with Power BI datasets.
 
 COMMON DAX ERRORS:
@@ -127,10 +550,34 @@ Always respond with a JSON object containing:
     "alternative_approaches": ["other ways to get this information"]
 }"""
 
-    def _load_dax_patterns(self) -> Dict[str, str]:
-        """Load common DAX query patterns"""
-        return {
-            "top_n_by_measure": """
+# System prompt for reviewing a low-confidence translation before it is executed
+_SELF_CRITIQUE_PROMPT = """You are an expert Power BI DAX reviewer.
+A DAX query was translated from a business question but the translator was not confident in it.
+The query has not been executed yet.
+
+REVIEW CHECKLIST:
+1. Does the query actually answer the business question?
+2. Are all measures bracketed [Measure Name] and present in the available measures?
+3. Are columns written as 'Table'[Column] using available tables?
+4. Is the filter context correct (CALCULATE, time intelligence, totals)?
+5. Is the syntax valid (EVALUATE, commas, parentheses)?
+
+Return the corrected query, or the original query unchanged if it is already correct.
+
+RESPONSE FORMAT:
+Always respond with a JSON object containing:
+{
+    "query": "the reviewed DAX query",
+    "explanation": "what was changed and why, in business terms",
+    "measures_used": ["list of measures"],
+    "tables_referenced": ["list of tables"],
+    "confidence": 0.0-1.0,
+    "requires_time_intelligence": true/false
+}"""
+
+# Common DAX query patterns
+_DAX_PATTERNS = MappingProxyType({
+    "top_n_by_measure": """
 EVALUATE
 TOPN(
     {n},
@@ -141,7 +588,7 @@ TOPN(
     {measure}, DESC
 )
 """,
-            "time_comparison": """
+    "time_comparison": """
 EVALUATE
 SUMMARIZECOLUMNS(
     {time_dimension},
@@ -151,7 +598,7 @@ SUMMARIZECOLUMNS(
 )
 ORDER BY {time_dimension} DESC
 """,
-            "breakdown_by_dimension": """
+    "breakdown_by_dimension": """
 EVALUATE
 SUMMARIZECOLUMNS(
     {dimension},
@@ -160,13 +607,13 @@ SUMMARIZECOLUMNS(
 )
 ORDER BY {measure} DESC
 """,
-            "multi_measure_summary": """
+    "multi_measure_summary": """
 EVALUATE
 ROW(
     {measure_list}
 )
 """,
-            "filtered_analysis": """
+    "filtered_analysis": """
 EVALUATE
 CALCULATETABLE(
     SUMMARIZECOLUMNS(
@@ -177,7 +624,7 @@ CALCULATETABLE(
 )
 ORDER BY {measure} DESC
 """,
-            "trend_analysis": """
+    "trend_analysis": """
 EVALUATE
 SUMMARIZECOLUMNS(
     {date_dimension},
@@ -187,54 +634,117 @@ SUMMARIZECOLUMNS(
 )
 ORDER BY {date_dimension}
 """
-        }
+})
+
+class AnalystTranslator:
+    """Translates natural language queries to DAX using Azure OpenAI"""
+    
+    __slots__ = ('endpoint', 'api_key', 'deployment_name', '_client')
+    
+    def __init__(self):
+        # Azure OpenAI configuration (reuse from main translator)
+        self.endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "").rstrip("/")
+        self.api_key = os.environ.get("AZURE_OPENAI_API_KEY", "")
+        self.deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        
+        # Client is built on first use to keep import and cold start cheap
+        self._client = _UNSET
+    
+    @property
+    def client(self) -> Optional[AsyncAzureOpenAI]:
+        """Azure OpenAI client, constructed on first access (None if not configured)"""
+        if self._client is _UNSET:
+            if not self.endpoint or not self.api_key:
+                logger.warning("Azure OpenAI not configured for analyst translator")
+                self._client = None
+            else:
+                self._client = AsyncAzureOpenAI(
+                    azure_endpoint=self.endpoint,
+                    api_key=self.api_key,
+                    api_version=_API_VERSION,
+                    timeout=_HTTP_TIMEOUT,
+                    max_retries=_MAX_RETRIES,
+                    http_client=_get_http_client()
+                )
+        return self._client
     
     async def translate_to_dax(self, 
                              natural_language_query: str,
                              context: TranslationContext) -> DAXQuery:
         """Translate natural language query to DAX"""
+        result = None
+        async for result in self.translate_to_dax_stream(natural_language_query, context):
+            pass
+        return result
+    
+    async def translate_to_dax_stream(self,
+                                    natural_language_query: str,
+                                    context: TranslationContext) -> AsyncIterator[DAXQuery]:
+        """Translate natural language query to DAX, streaming the response
+        
+        Yields a partial DAXQuery (query only) as soon as the "query" field has
+        been streamed, then the complete DAXQuery. The last item is always final.
+        """
         
         if not self.client:
             # Fallback to pattern matching if OpenAI not available
-            return self._pattern_based_translation(natural_language_query, context)
+            yield self._pattern_based_translation(natural_language_query, context)
+            return
         
         try:
             # Build the context message
             context_message = self._build_context_message(natural_language_query, context)
             
             messages = [
-                {"role": "system", "content": self.system_prompt},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": context_message}
             ]
             
             logger.info(f"Translating to DAX: {natural_language_query[:100]}...")
             
-            response = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.deployment_name,
                 messages=messages,
                 temperature=0.1,
                 max_tokens=800,
-                response_format={"type": "json_object"}
+                response_format=_DAX_RESPONSE_FORMAT,
+                stream=True
             )
             
-            result = json.loads(response.choices[0].message.content)
+            content = ""
+            query_sent = False
+            async for chunk in stream:
+                # Azure may send chunks without choices (e.g. content filter results)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                content += chunk.choices[0].delta.content
+                
+                if not query_sent:
+                    partial_query = _extract_query_field(content)
+                    if partial_query is not None:
+                        query_sent = True
+                        yield DAXQuery(
+                            query=self._validate_dax_query(partial_query, context),
+                            explanation="",
+                            measures_used=[],
+                            tables_referenced=[],
+                            confidence=0.0,
+                            requires_time_intelligence=False,
+                            partial=True
+                        )
+            
+            result = _json_loads(content)
             
             # Validate the query against available metadata
             validated_query = self._validate_dax_query(result["query"], context)
             
-            return DAXQuery(
-                query=validated_query,
-                explanation=result.get("explanation", ""),
-                measures_used=result.get("measures_used", []),
-                tables_referenced=result.get("tables_referenced", []),
-                confidence=float(result.get("confidence", 0.8)),
-                requires_time_intelligence=result.get("requires_time_intelligence", False)
-            )
+            yield _dax_query_from_result(validated_query, result)
             
         except Exception as e:
             logger.error(f"Translation error: {e}")
+            _warn_if_schema_rejected(e)
             # Fallback to pattern matching
-            return self._pattern_based_translation(natural_language_query, context)
+            yield self._pattern_based_translation(natural_language_query, context)
     
     async def analyze_dax_error(self,
                                failed_query: str,
@@ -246,6 +756,8 @@ ORDER BY {date_dimension}
             return self._basic_error_analysis(failed_query, error_message, context)
         
         try:
+            error_measures, error_tables = context.index.error_samples()
+            
             error_context = f"""
 Failed DAX Query:
 {failed_query}
@@ -254,26 +766,28 @@ Error Message:
 {error_message}
 
 Available Measures:
-{', '.join(context.available_measures[:20])}
+{error_measures}
 
 Available Tables:
-{', '.join(context.available_tables[:20])}
+{error_tables}
 """
             
             messages = [
-                {"role": "system", "content": self.error_analysis_prompt},
+                {"role": "system", "content": _ERROR_ANALYSIS_PROMPT},
                 {"role": "user", "content": error_context}
             ]
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.deployment_name,
                 messages=messages,
                 temperature=0.2,
                 max_tokens=600,
-                response_format={"type": "json_object"}
+                response_format=_ERROR_RESPONSE_FORMAT
             )
             
-            result = json.loads(response.choices[0].message.content)
+            _log_cached_tokens("Error analysis", response.usage)
+            
+            result = _json_loads(response.choices[0].message.content)
             
             return {
                 "error_type": result.get("error_type", "unknown"),
@@ -285,128 +799,196 @@ Available Tables:
             
         except Exception as e:
             logger.error(f"Error analysis failed: {e}")
+            _warn_if_schema_rejected(e)
             return self._basic_error_analysis(failed_query, error_message, context)
     
+    async def translate_with_speculation(self,
+                                         natural_language_query: str,
+                                         context: TranslationContext) -> DAXQuery:
+        """Translate to DAX, speculatively retrying low-confidence translations
+        
+        When the first translation's confidence is below SPECULATION_THRESHOLD,
+        a self-critique of that query and an independent alternative translation
+        run concurrently, and the highest-confidence result is returned.
+        """
+        result = await self.translate_to_dax(natural_language_query, context)
+        
+        if not SPECULATIVE_RETRY or not self.client or result.confidence >= SPECULATION_THRESHOLD:
+            return result
+        
+        logger.info(f"Low translation confidence ({result.confidence:.2f}), running speculative retry")
+        candidates = await asyncio.gather(
+            self._self_critique(natural_language_query, result.query, context),
+            self._alt_translate(natural_language_query, context),
+            return_exceptions=True
+        )
+        
+        best = result
+        for candidate in candidates:
+            if isinstance(candidate, Exception):
+                logger.warning(f"Speculative translation failed: {candidate}")
+                _warn_if_schema_rejected(candidate)
+            elif candidate.query and candidate.confidence > best.confidence:
+                best = candidate
+        
+        return best
+    
+    async def _self_critique(self,
+                             natural_language_query: str,
+                             dax_query: str,
+                             context: TranslationContext) -> DAXQuery:
+        """Ask the model to review and correct a low-confidence DAX query"""
+        review_message = "".join([
+            self._build_context_message(natural_language_query, context),
+            "\n\nCandidate DAX Query:\n", dax_query
+        ])
+        
+        response = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=[
+                {"role": "system", "content": _SELF_CRITIQUE_PROMPT},
+                {"role": "user", "content": review_message}
+            ],
+            temperature=0.1,
+            max_tokens=800,
+            response_format=_DAX_RESPONSE_FORMAT
+        )
+        
+        _log_cached_tokens("Self-critique", response.usage)
+        
+        result = _json_loads(response.choices[0].message.content)
+        return _dax_query_from_result(self._validate_dax_query(result["query"], context), result)
+    
+    async def _alt_translate(self, natural_language_query: str, context: TranslationContext) -> DAXQuery:
+        """Produce an independent alternative translation at a higher temperature"""
+        response = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_context_message(natural_language_query, context)}
+            ],
+            temperature=0.5,
+            max_tokens=800,
+            response_format=_DAX_RESPONSE_FORMAT
+        )
+        
+        result = _json_loads(response.choices[0].message.content)
+        return _dax_query_from_result(self._validate_dax_query(result["query"], context), result)
+    
     def _build_context_message(self, query: str, context: TranslationContext) -> str:
         """Build context message for translation"""
         
-        # Sample of available measures and tables
-        measures_sample = context.available_measures[:30] if context.available_measures else []
-        tables_sample = context.available_tables[:20] if context.available_tables else []
+        # Sample of available measures (ranked by relevance) and tables (cached per dataset)
+        measures_sample = context.measures_sample_for(query)
         
-        message = f"""
-Business Question: {query}
-
-Available Measures (sample):
-{', '.join(f'[{m}]' for m in measures_sample)}
-
-Available Tables:
-{', '.join(tables_sample)}
-
-Additional Context:
-- Current date context should use TODAY() or NOW()
-- Fiscal year starts in {context.business_context.get('fiscal_year_start', 'January')}
-- Default currency is {context.business_context.get('currency', 'USD')}
-"""
+        parts = [
+            "\nBusiness Question: ", query,
+            "\n\nAvailable Measures (sample):\n", measures_sample,
+            "\n\nAvailable Tables:\n", context.index.tables_sample(),
+            "\n\nAdditional Context:\n- Current date context should use TODAY() or NOW()\n",
+            _business_line(context.business_context.get('fiscal_year_start', 'January'),
+                           context.business_context.get('currency', 'USD')), "\n"
+        ]
         
         # Add recent query context if available
         if context.query_history:
-            recent = context.query_history[-1]
-            message += f"\n\nPrevious query was about: {recent}"
+            parts.append("\n\nPrevious query was about: ")
+            parts.append(context.query_history[-1])
         
-        return message
+        return "".join(parts)
     
     def _pattern_based_translation(self, query: str, context: TranslationContext) -> DAXQuery:
         """Fallback pattern-based translation when AI is not available"""
-        query_lower = query.lower()
-        
-        # Detect query intent
-        if "top" in query_lower and any(word in query_lower for word in ["revenue", "sales", "customer"]):
-            # Top N pattern
-            measure = "[Total Revenue]"  # Default
-            dimension = "'Product'[Product Name]"  # Default
-            n = 10
-            
-            # Extract number if specified
-            import re
-            numbers = re.findall(r'\b(\d+)\b', query)
-            if numbers:
-                n = int(numbers[0])
-            
-            # Determine measure
-            if "customer" in query_lower:
-                measure = "[Customer Count]"
-                dimension = "'Customer'[Customer Name]"
-            elif "product" in query_lower:
-                dimension = "'Product'[Product Name]"
-            
-            dax = self.dax_patterns["top_n_by_measure"].format(
-                n=n,
-                dimension=dimension,
-                measure_name=measure.strip("[]"),
-                measure=measure
-            )
-            
-            return DAXQuery(
-                query=dax.strip(),
-                explanation=f"Shows top {n} by {measure}",
-                measures_used=[measure],
-                tables_referenced=[dimension.split("'")[1]],
-                confidence=0.7,
-                requires_time_intelligence=False
-            )
+        # Detect query intent in one pass
+        intent = _INTENT_RE.match(query)
+        handler = _INTENT_HANDLERS[intent.lastgroup] if intent else AnalystTranslator._summary_translation
         
-        elif any(word in query_lower for word in ["compare", "vs", "versus", "last year"]):
-            # Time comparison pattern
-            measure = "[Total Revenue]"
-            time_dim = "'Date'[Month]"
-            date_col = "'Date'[Date]"
-            
-            dax = self.dax_patterns["time_comparison"].format(
-                time_dimension=time_dim,
-                measure=measure,
-                date_column=date_col
-            )
-            
-            return DAXQuery(
-                query=dax.strip(),
-                explanation="Compares current period with previous period",
-                measures_used=[measure],
-                tables_referenced=["Date"],
-                confidence=0.6,
-                requires_time_intelligence=True
-            )
+        return handler(self, query, _tokenize(query.lower()))
+    
+    def _top_n_translation(self, query: str, tokens: FrozenSet[str]) -> DAXQuery:
+        """Top N pattern"""
+        measure = "[Total Revenue]"  # Default
+        dimension = "'Product'[Product Name]"  # Default
+        n = 10
         
-        else:
-            # Default summary query
-            measures = []
-            if "revenue" in query_lower:
-                measures.append('"Total Revenue", [Total Revenue]')
-            if "customer" in query_lower:
-                measures.append('"Customer Count", [Customer Count]')
-            if "profit" in query_lower:
-                measures.append('"Total Profit", [Total Profit]')
-            
-            if not measures:
-                measures = ['"Total Revenue", [Total Revenue]']
-            
-            dax = self.dax_patterns["multi_measure_summary"].format(
-                measure_list=",\n    ".join(measures)
-            )
-            
-            return DAXQuery(
-                query=dax.strip(),
-                explanation="Summary of key metrics",
-                measures_used=[m.split(",")[1].strip().strip("]") + "]" for m in measures],
-                tables_referenced=[],
-                confidence=0.5,
-                requires_time_intelligence=False
-            )
+        # Extract number if specified
+        number = _NUM_RE.search(query)
+        if number:
+            n = int(number.group(1))
+        
+        # Determine measure
+        if "customer" in tokens:
+            measure = "[Customer Count]"
+            dimension = "'Customer'[Customer Name]"
+        elif "product" in tokens:
+            dimension = "'Product'[Product Name]"
+        
+        dax = _DAX_PATTERNS["top_n_by_measure"].format(
+            n=n,
+            dimension=dimension,
+            measure_name=measure.strip("[]"),
+            measure=measure
+        )
+        
+        return DAXQuery(
+            query=dax.strip(),
+            explanation=f"Shows top {n} by {measure}",
+            measures_used=[measure],
+            tables_referenced=[dimension.split("'")[1]],
+            confidence=0.7,
+            requires_time_intelligence=False
+        )
+    
+    def _time_comparison_translation(self, query: str, tokens: FrozenSet[str]) -> DAXQuery:
+        """Time comparison pattern"""
+        measure = "[Total Revenue]"
+        time_dim = "'Date'[Month]"
+        date_col = "'Date'[Date]"
+        
+        dax = _DAX_PATTERNS["time_comparison"].format(
+            time_dimension=time_dim,
+            measure=measure,
+            date_column=date_col
+        )
+        
+        return DAXQuery(
+            query=dax.strip(),
+            explanation="Compares current period with previous period",
+            measures_used=[measure],
+            tables_referenced=["Date"],
+            confidence=0.6,
+            requires_time_intelligence=True
+        )
+    
+    def _summary_translation(self, query: str, tokens: FrozenSet[str]) -> DAXQuery:
+        """Default summary query"""
+        measures = [expr for keyword, expr in _SUMMARY_MEASURES if keyword in tokens]
+        
+        if not measures:
+            measures = ['"Total Revenue", [Total Revenue]']
+        
+        dax = _DAX_PATTERNS["multi_measure_summary"].format(
+            measure_list=",\n    ".join(measures)
+        )
+        
+        return DAXQuery(
+            query=dax.strip(),
+            explanation="Summary of key metrics",
+            measures_used=[m.split(",")[1].strip().strip("]") + "]" for m in measures],
+            tables_referenced=[],
+            confidence=0.5,
+            requires_time_intelligence=False
+        )
     
     def _validate_dax_query(self, query: str, context: TranslationContext) -> str:
         """Validate and potentially fix DAX query based on available metadata"""
         # This is a simplified validation - in production, implement more thorough checks
         
+        # Fast path: nothing to fix unless some measure appears without brackets
+        unbracketed = context.index.unbracketed_measure_re()
+        if unbracketed is None or not unbracketed.search(query):
+            return query
+        
         # Check if measures exist (basic check)
         for measure in context.available_measures:
             # Ensure measures are properly bracketed
@@ -472,63 +1054,32 @@ Additional Context:
                                 results: Any,
                                 context: TranslationContext) -> List[Dict[str, str]]:
         """Suggest relevant follow-up queries based on results"""
-        suggestions = []
-        
-        # Analyze what type of query was run
-        query_lower = query.lower()
-        
-        if "revenue" in query_lower:
-            suggestions.extend([
-                {
-                    "question": "What are the top contributing products?",
-                    "purpose": "Identify revenue drivers"
-                },
-                {
-                    "question": "How does this compare to last year?",
-                    "purpose": "Year-over-year comparison"
-                },
-                {
-                    "question": "Which regions are underperforming?",
-                    "purpose": "Geographic analysis"
-                }
-            ])
-        
-        elif "customer" in query_lower:
-            suggestions.extend([
-                {
-                    "question": "What is the customer retention rate?",
-                    "purpose": "Loyalty analysis"
-                },
-                {
-                    "question": "Which customer segments are most valuable?",
-                    "purpose": "Segmentation analysis"
-                },
-                {
-                    "question": "What is the average customer lifetime value?",
-                    "purpose": "Value analysis"
-                }
-            ])
-        
-        elif any(word in query_lower for word in ["efficiency", "cost", "expense"]):
-            suggestions.extend([
-                {
-                    "question": "What are the main cost drivers?",
-                    "purpose": "Cost analysis"
-                },
-                {
-                    "question": "How has efficiency changed over time?",
-                    "purpose": "Trend analysis"
-                },
-                {
-                    "question": "Which departments have the highest costs?",
-                    "purpose": "Departmental analysis"
-                }
-            ])
+        tokens = _tokenize(query.lower())
+        
+        # Pick the first matching query type
+        for intent, keywords in _FOLLOWUP_INTENTS.items():
+            if tokens & keywords:
+                return [dict(s) for s in _FOLLOWUP_SUGGESTIONS[intent][:3]]  # Return top 3 suggestions (copies)
         
-        return suggestions[:3]  # Return top 3 suggestions
+        return []
+
+# Intent handlers for the pattern-based fallback, keyed by _INTENT_RE group name
+_INTENT_HANDLERS: Dict[str, Callable[..., DAXQuery]] = {
+    "topn": AnalystTranslator._top_n_translation,
+    "cmp": AnalystTranslator._time_comparison_translation,
+}
+
+# Singleton instance, created on first access via module __getattr__ (PEP 562)
+_analyst_translator: Optional[AnalystTranslator] = None
 
-# Create singleton instance
-analyst_translator = AnalystTranslator()
+def __getattr__(name: str) -> Any:
+    global _analyst_translator
+    if name == "analyst_translator":
+        if _analyst_translator is None:
+            _analyst_translator = AnalystTranslator()
+        return _analyst_translator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Export
-__all__ = ['AnalystTranslator', 'analyst_translator', 'DAXQuery', 'TranslationContext']
\ No newline at end of file
+__all__ = ['AnalystTranslator', 'analyst_translator', 'DAXQuery', 'TranslationContext', 'DatasetIndex',
+           'preload_encoding']
\ No newline at end of file
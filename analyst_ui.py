@@ -3,19 +3,48 @@
 Power BI Analyst UI - Clean business intelligence interface for natural language queries
 """
 
-def get_analyst_html():
-    """Generate the Power BI Analyst HTML interface"""
-    return f'''<!DOCTYPE html>
+import os
+import re
+import hashlib
+
+try:
+    import rjsmin
+    RJSMIN_AVAILABLE = True
+except ImportError:
+    rjsmin = None
+    RJSMIN_AVAILABLE = False
+
+try:
+    import rcssmin
+    RCSSMIN_AVAILABLE = True
+except ImportError:
+    rcssmin = None
+    RCSSMIN_AVAILABLE = False
+
+# Serve the readable, unminified assets (with debug logging) while developing
+ANALYST_DEBUG = os.environ.get("ANALYST_DEBUG", "false").lower() == "true"
+
+# Static page fragments around the stylesheet and script
+_HEAD_HTML = '''<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Power BI Analyst - Business Intelligence Assistant</title>
-    <style>
-        {get_analyst_css()}
-    </style>
+    <!-- Start the workspace request while the page is still parsing -->
+    <link rel="preload" href="/analyst/api/workspaces" as="fetch" crossorigin>
+    '''
+
+_MID_HTML = '''
 </head>
 <body>
+    <!-- Toolbar icons, defined once and referenced with <use> -->
+    <svg class="hidden" aria-hidden="true">
+        <symbol id="ico-plug" viewBox="0 0 24 24"><path d="M9 2v6M15 2v6M6 8h12v4a6 6 0 0 1-12 0zM12 18v4"/></symbol>
+        <symbol id="ico-home" viewBox="0 0 24 24"><path d="M3 10.5 12 3l9 7.5V21h-6v-6H9v6H3z"/></symbol>
+        <symbol id="ico-refresh" viewBox="0 0 24 24"><path d="M20 12a8 8 0 1 1-2.34-5.66M20 4v5h-5"/></symbol>
+        <symbol id="ico-send" viewBox="0 0 24 24"><path d="M22 2 11 13M22 2l-7 20-4-9-9-4z"/></symbol>
+    </svg>
     <div class="container">
         <!-- Header -->
         <div class="header">
@@ -28,11 +57,11 @@ def get_analyst_html():
                     </div>
                 </div>
                 <div class="header-actions">
-                    <button class="header-button" onclick="testConnection()">
-                        <span class="icon">🔌</span> Test Connection
+                    <button class="header-button" data-action="test-connection">
+                        <svg class="icon"><use href="#ico-plug"/></svg> Test Connection
                     </button>
                     <a href="/" class="header-button">
-                        <span class="icon">🏠</span> Home
+                        <svg class="icon"><use href="#ico-home"/></svg> Home
                     </a>
                 </div>
             </div>
@@ -44,28 +73,28 @@ def get_analyst_html():
             <div class="workspace-section">
                 <div class="section-header">
                     <h2>Select Workspace & Dataset</h2>
-                    <button class="refresh-button" onclick="loadWorkspaces()">
-                        <span class="icon">🔄</span> Refresh
+                    <button class="refresh-button" data-action="refresh-workspaces">
+                        <svg class="icon"><use href="#ico-refresh"/></svg> Refresh
                     </button>
                 </div>
                 
                 <div class="selector-container">
                     <div class="selector-group">
                         <label for="workspaceSelect">Workspace:</label>
-                        <select id="workspaceSelect" onchange="onWorkspaceChange()">
+                        <select id="workspaceSelect">
                             <option value="">Loading workspaces...</option>
                         </select>
                     </div>
                     
                     <div class="selector-group">
                         <label for="datasetSelect">Dataset:</label>
-                        <select id="datasetSelect" onchange="onDatasetChange()">
+                        <select id="datasetSelect">
                             <option value="">Select a workspace first</option>
                         </select>
                     </div>
                 </div>
                 
-                <div id="selectionInfo" class="selection-info" style="display: none;">
+                <div id="selectionInfo" class="selection-info hidden">
                     <div class="info-badge">
                         <span class="icon">📊</span>
                         <span id="selectedDatasetName">No dataset selected</span>
@@ -81,7 +110,7 @@ def get_analyst_html():
                         <div class="message-header">
                             <span class="icon">🤖</span>
                             <span class="name">Power BI Analyst</span>
-                            <span class="time">${{new Date().toLocaleTimeString()}}</span>
+                            <span class="time" id="welcomeTime"></span>
                         </div>
                         <div class="message-content">
                             <p>Welcome! I'm your AI-powered business analyst for Power BI.</p>
@@ -115,41 +144,168 @@ def get_analyst_html():
                             id="queryInput" 
                             placeholder="Ask a business question... (e.g., 'How is revenue trending this quarter?')"
                             rows="2"
-                            onkeydown="handleKeyPress(event)"
                         ></textarea>
-                        <button id="sendButton" onclick="sendQuery()" disabled>
-                            <span class="icon">🚀</span>
+                        <button id="sendButton" data-action="send-query" disabled>
+                            <svg class="icon"><use href="#ico-send"/></svg>
                             <span>Analyze</span>
                         </button>
                     </div>
                     
                     <!-- Suggestions -->
-                    <div id="suggestions" class="suggestions" style="display: none;">
+                    <div id="suggestions" class="suggestions hidden">
                         <span class="suggestions-label">Suggested questions:</span>
                         <div id="suggestionButtons" class="suggestion-buttons"></div>
                     </div>
                 </div>
             </div>
         </div>
+    </div>
 
-        <!-- Loading Overlay -->
-        <div id="loadingOverlay" class="loading-overlay" style="display: none;">
+    <!-- Loading Overlay, instantiated the first time it is shown -->
+    <template id="loadingTpl">
+        <div class="loading-overlay">
             <div class="loading-content">
                 <div class="spinner"></div>
-                <p id="loadingMessage">Initializing Power BI connection...</p>
+                <p class="loading-message">Initializing Power BI connection...</p>
             </div>
         </div>
-    </div>
+    </template>
+
+    <!-- Message Templates -->
+    <template id="msgTpl">
+        <div class="message assistant">
+            <div class="message-header">
+                <span class="icon">🤖</span>
+                <span class="name">Power BI Analyst</span>
+                <span class="time"></span>
+            </div>
+            <div class="message-content"></div>
+        </div>
+    </template>
+
+    <template id="errorAnalysisTpl">
+        <div class="error-section">
+            <h4>❌ Query Error</h4>
+            <p class="error-text"></p>
+        </div>
+        <div class="insights-section">
+            <div class="insights-header">
+                <span class="icon">🔧</span>
+                <span>Error Analysis</span>
+            </div>
+            <p><strong>Issue:</strong> <span class="issue"></span></p>
+            <p><strong>Fix:</strong> <span class="fix"></span></p>
+            <button class="suggestion-button apply-fix" data-action="apply-fix">Apply Suggested Fix</button>
+        </div>
+    </template>
 
-    <script>
-        {get_analyst_javascript()}
-    </script>
+    <template id="insightsTpl">
+        <div class="insights-section">
+            <div class="insights-header">
+                <span class="icon">💡</span>
+                <span>Key Insights</span>
+            </div>
+        </div>
+    </template>
+
+    <template id="recommendationsTpl">
+        <div class="recommendations-section">
+            <div class="insights-header">
+                <span class="icon">🎯</span>
+                <span>Recommendations</span>
+            </div>
+        </div>
+    </template>
+
+    <template id="daxTpl">
+        <details class="dax-details">
+            <summary>View DAX Query</summary>
+            <div class="dax-query"></div>
+        </details>
+    </template>
+
+    '''
+
+_TAIL_HTML = '''
 </body>
 </html>'''
 
-def get_analyst_css():
-    """Return CSS styles for the analyst interface"""
+def _build_analyst_html():
+    """Generate the Power BI Analyst HTML interface"""
+    return ''.join((
+        _HEAD_HTML,
+        f'<link rel="preload" href="{ANALYST_JS_PATH}" as="script">',
+        '<style>', _CRITICAL_CSS, '</style>',
+        # Results, insights and overlay styles are not needed for the first paint
+        # (media="print" until the script switches it on; no inline handler, for CSP)
+        f'<link rel="stylesheet" href="{ANALYST_CSS_PATH}" media="print" id="deferredCss">',
+        f'<noscript><link rel="stylesheet" href="{ANALYST_CSS_PATH}"></noscript>',
+        _MID_HTML,
+        f'<script src="{ANALYST_JS_PATH}"></script>',
+        _TAIL_HTML
+    ))
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_RE = re.compile(r'\s+')
+_CSS_PUNCT_RE = re.compile(r'\s*([{};:,>])\s*')
+
+def _minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    if ANALYST_DEBUG:
+        return css
+    if RCSSMIN_AVAILABLE:
+        return rcssmin.cssmin(css)
+    
+    css = _CSS_COMMENT_RE.sub('', css)
+    css = _CSS_SPACE_RE.sub(' ', css)
+    css = _CSS_PUNCT_RE.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+_JS_CONSOLE_LOG_RE = re.compile(r'^[ \t]*console\.log\(.*\);[ \t]*$\n?', re.M)
+_JS_LINE_COMMENT_RE = re.compile(r'^[ \t]*//.*$\n?', re.M)
+
+def _minify_js(js):
+    """Drop debug logging, comments and indentation from the script"""
+    if ANALYST_DEBUG:
+        return js
+    
+    js = _JS_CONSOLE_LOG_RE.sub('', js)
+    if RJSMIN_AVAILABLE:
+        return rjsmin.jsmin(js)
+    
+    # Conservative fallback: keep line breaks so automatic semicolon
+    # insertion behaves exactly as in the source
+    js = _JS_LINE_COMMENT_RE.sub('', js)
+    return '\n'.join(line.strip() for line in js.splitlines() if line.strip())
+
+def _content_hash(text):
+    """Short content hash used for cache busting and ETags"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def _build_critical_css():
+    """Return the CSS needed for the first paint, inlined into the page"""
     return '''
+    /* Theme */
+    :root {
+        --brand: #667eea;
+        --brand-grad: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        --focus-ring: rgba(102, 126, 234, 0.1);
+        --text: #2d3748;
+        --text-muted: #4a5568;
+        --text-subtle: #718096;
+        --border: #e2e8f0;
+        --border-strong: #cbd5e0;
+        --bg-soft: #f7fafc;
+        --bg-hover: #edf2f7;
+        --shadow: rgba(0, 0, 0, 0.1);
+        --error-text: #742a2a;
+        --success: #10b981;
+        --line: 1px solid var(--border);
+        --radius: 0.5rem;
+        --radius-sm: 0.375rem;
+        --fs-sm: 0.875rem;
+    }
+
     /* Reset and Base Styles */
     * {
         margin: 0;
@@ -160,7 +316,7 @@ def get_analyst_css():
     body {
         font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
         background: #f5f7fa;
-        color: #2d3748;
+        color: var(--text);
         line-height: 1.6;
         height: 100vh;
         overflow: hidden;
@@ -176,7 +332,7 @@ def get_analyst_css():
     /* Header */
     .header {
         background: white;
-        border-bottom: 1px solid #e2e8f0;
+        border-bottom: var(--line);
         padding: 1rem 2rem;
         box-shadow: 0 1px 3px rgba(0, 0, 0, 0.05);
     }
@@ -197,7 +353,7 @@ def get_analyst_css():
 
     .logo {
         font-size: 2.5rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        background: var(--brand-grad);
         -webkit-background-clip: text;
         -webkit-text-fill-color: transparent;
     }
@@ -210,8 +366,8 @@ def get_analyst_css():
     }
 
     .tagline {
-        font-size: 0.875rem;
-        color: #718096;
+        font-size: var(--fs-sm);
+        color: var(--text-subtle);
         margin: 0;
     }
 
@@ -226,18 +382,18 @@ def get_analyst_css():
         gap: 0.5rem;
         padding: 0.5rem 1rem;
         background: white;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.5rem;
-        color: #4a5568;
+        border: var(--line);
+        border-radius: var(--radius);
+        color: var(--text-muted);
         text-decoration: none;
-        font-size: 0.875rem;
+        font-size: var(--fs-sm);
         cursor: pointer;
-        transition: all 0.2s;
+        transition: background-color 0.2s, border-color 0.2s, transform 0.2s;
     }
 
     .header-button:hover {
-        background: #f7fafc;
-        border-color: #cbd5e0;
+        background: var(--bg-soft);
+        border-color: var(--border-strong);
         transform: translateY(-1px);
     }
 
@@ -259,7 +415,7 @@ def get_analyst_css():
         background: white;
         border-radius: 0.75rem;
         padding: 1.5rem;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
+        box-shadow: 0 1px 3px var(--shadow);
     }
 
     .section-header {
@@ -272,7 +428,7 @@ def get_analyst_css():
     .section-header h2 {
         font-size: 1.125rem;
         font-weight: 600;
-        color: #2d3748;
+        color: var(--text);
     }
 
     .refresh-button {
@@ -280,17 +436,17 @@ def get_analyst_css():
         align-items: center;
         gap: 0.375rem;
         padding: 0.375rem 0.75rem;
-        background: #edf2f7;
+        background: var(--bg-hover);
         border: none;
-        border-radius: 0.375rem;
-        color: #4a5568;
-        font-size: 0.875rem;
+        border-radius: var(--radius-sm);
+        color: var(--text-muted);
+        font-size: var(--fs-sm);
         cursor: pointer;
-        transition: all 0.2s;
+        transition: background-color 0.2s;
     }
 
     .refresh-button:hover {
-        background: #e2e8f0;
+        background: var(--border);
     }
 
     .selector-container {
@@ -307,45 +463,45 @@ def get_analyst_css():
     }
 
     .selector-group label {
-        font-size: 0.875rem;
+        font-size: var(--fs-sm);
         font-weight: 500;
-        color: #4a5568;
+        color: var(--text-muted);
     }
 
     .selector-group select {
         padding: 0.625rem 0.875rem;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.5rem;
+        border: var(--line);
+        border-radius: var(--radius);
         background: white;
-        color: #2d3748;
-        font-size: 0.875rem;
+        color: var(--text);
+        font-size: var(--fs-sm);
         cursor: pointer;
-        transition: all 0.2s;
+        transition: border-color 0.2s, box-shadow 0.2s;
     }
 
     .selector-group select:hover {
-        border-color: #cbd5e0;
+        border-color: var(--border-strong);
     }
 
     .selector-group select:focus {
         outline: none;
-        border-color: #667eea;
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+        border-color: var(--brand);
+        box-shadow: 0 0 0 3px var(--focus-ring);
     }
 
     .selection-info {
         padding: 0.75rem;
-        background: #f7fafc;
-        border-radius: 0.5rem;
-        border: 1px solid #e2e8f0;
+        background: var(--bg-soft);
+        border-radius: var(--radius);
+        border: var(--line);
     }
 
     .info-badge {
         display: flex;
         align-items: center;
         gap: 0.5rem;
-        color: #4a5568;
-        font-size: 0.875rem;
+        color: var(--text-muted);
+        font-size: var(--fs-sm);
     }
 
     /* Chat Section */
@@ -353,7 +509,7 @@ def get_analyst_css():
         flex: 1;
         background: white;
         border-radius: 0.75rem;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
+        box-shadow: 0 1px 3px var(--shadow);
         display: flex;
         flex-direction: column;
         overflow: hidden;
@@ -369,10 +525,28 @@ def get_analyst_css():
     }
 
     /* Messages */
+    .history-sentinel {
+        flex: none;
+        height: 1px;
+        margin-bottom: -1rem;
+    }
+
+    /* Off-screen messages skip layout and paint until scrolled into view */
     .message {
+        content-visibility: auto;
+        contain-intrinsic-size: auto 160px;
+    }
+
+    .message.animate {
         animation: fadeIn 0.3s ease-out;
     }
 
+    @media (prefers-reduced-motion: reduce) {
+        .message.animate {
+            animation: none;
+        }
+    }
+
     @keyframes fadeIn {
         from {
             opacity: 0;
@@ -389,7 +563,7 @@ def get_analyst_css():
         align-items: center;
         gap: 0.5rem;
         margin-bottom: 0.5rem;
-        font-size: 0.875rem;
+        font-size: var(--fs-sm);
     }
 
     .message-header .icon {
@@ -398,7 +572,7 @@ def get_analyst_css():
 
     .message-header .name {
         font-weight: 600;
-        color: #2d3748;
+        color: var(--text);
     }
 
     .message-header .time {
@@ -408,19 +582,19 @@ def get_analyst_css():
 
     .message-content {
         padding: 1rem;
-        border-radius: 0.5rem;
-        font-size: 0.875rem;
+        border-radius: var(--radius);
+        font-size: var(--fs-sm);
         line-height: 1.6;
     }
 
     .message.assistant .message-content {
-        background: #f7fafc;
-        border: 1px solid #e2e8f0;
-        color: #2d3748;
+        background: var(--bg-soft);
+        border: var(--line);
+        color: var(--text);
     }
 
     .message.user .message-content {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        background: var(--brand-grad);
         color: white;
         margin-left: 4rem;
     }
@@ -443,14 +617,14 @@ def get_analyst_css():
         padding: 0.5rem;
         margin: 0.25rem 0;
         background: white;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.375rem;
+        border: var(--line);
+        border-radius: var(--radius-sm);
         cursor: pointer;
-        transition: all 0.2s;
+        transition: background-color 0.2s, transform 0.2s;
     }
 
     .example-questions li:hover {
-        background: #edf2f7;
+        background: var(--bg-hover);
         transform: translateX(4px);
     }
 
@@ -460,17 +634,121 @@ def get_analyst_css():
         padding: 0.5rem 0.75rem;
         background: #fef3c7;
         border: 1px solid #fcd34d;
-        border-radius: 0.375rem;
+        border-radius: var(--radius-sm);
         color: #92400e;
         font-size: 0.813rem;
     }
 
+    /* Input Section */
+    .input-section {
+        padding: 1.5rem;
+        border-top: var(--line);
+        background: var(--bg-soft);
+    }
+
+    .input-container {
+        display: flex;
+        gap: 1rem;
+        align-items: flex-end;
+    }
+
+    #queryInput {
+        flex: 1;
+        padding: 0.75rem;
+        border: var(--line);
+        border-radius: var(--radius);
+        background: white;
+        color: var(--text);
+        font-size: var(--fs-sm);
+        font-family: inherit;
+        resize: none;
+        transition: border-color 0.2s, box-shadow 0.2s;
+    }
+
+    #queryInput:focus {
+        outline: none;
+        border-color: var(--brand);
+        box-shadow: 0 0 0 3px var(--focus-ring);
+    }
+
+    #sendButton {
+        display: flex;
+        align-items: center;
+        gap: 0.5rem;
+        padding: 0.75rem 1.5rem;
+        background: var(--brand-grad);
+        color: white;
+        border: none;
+        border-radius: var(--radius);
+        font-weight: 600;
+        cursor: pointer;
+        transition: transform 0.2s, box-shadow 0.2s, opacity 0.2s;
+    }
+
+    #sendButton:hover:not(:disabled) {
+        transform: translateY(-2px);
+        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.3);
+    }
+
+    #sendButton:disabled {
+        opacity: 0.5;
+        cursor: not-allowed;
+    }
+
+    /* Visibility helper */
+    .hidden {
+        display: none !important;
+    }
+
+    /* Icon helper */
+    .icon {
+        display: inline-block;
+        font-size: 1rem;
+    }
+
+    svg.icon {
+        width: 1em;
+        height: 1em;
+        vertical-align: -0.125em;
+        fill: none;
+        stroke: currentColor;
+        stroke-width: 2;
+        stroke-linecap: round;
+        stroke-linejoin: round;
+    }
+
+    /* Responsive */
+    @media (max-width: 768px) {
+        .main-container {
+            padding: 1rem;
+        }
+        
+        .selector-container {
+            grid-template-columns: 1fr;
+        }
+        
+        .header-content {
+            flex-direction: column;
+            gap: 1rem;
+            align-items: flex-start;
+        }
+        
+        .message.user .message-content {
+            margin-left: 0;
+        }
+    }
+    '''
+
+def _build_analyst_css():
+    """Return the remaining CSS, loaded from the stylesheet without blocking render"""
+    return '''
     /* Data Display */
     .data-table {
+        contain: layout paint;
         margin: 1rem 0;
         overflow-x: auto;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.5rem;
+        border: var(--line);
+        border-radius: var(--radius);
     }
 
     .data-table table {
@@ -480,21 +758,51 @@ def get_analyst_css():
     }
 
     .data-table th {
-        background: #f7fafc;
+        background: var(--bg-soft);
         padding: 0.75rem;
         text-align: left;
         font-weight: 600;
-        color: #4a5568;
-        border-bottom: 1px solid #e2e8f0;
+        color: var(--text-muted);
+        border-bottom: var(--line);
     }
 
     .data-table td {
         padding: 0.75rem;
-        border-bottom: 1px solid #f7fafc;
+        border-bottom: 1px solid var(--bg-soft);
     }
 
     .data-table tr:hover {
-        background: #f7fafc;
+        background: var(--bg-soft);
+    }
+
+    .data-table.virtual {
+        max-height: 420px;
+        overflow-y: auto;
+    }
+
+    .data-table.virtual th {
+        position: sticky;
+        top: 0;
+        z-index: 1;
+    }
+
+    .data-table.virtual td {
+        white-space: nowrap;
+    }
+
+    .table-note {
+        margin-top: 6px;
+        font-size: 12px;
+        color: var(--text-subtle);
+    }
+
+    .data-table .spacer td {
+        padding: 0;
+        border: 0;
+    }
+
+    .data-table tr.spacer:hover {
+        background: none;
     }
 
     /* Insights Section */
@@ -502,8 +810,8 @@ def get_analyst_css():
         margin-top: 1rem;
         padding: 1rem;
         background: #f0f4f8;
-        border-radius: 0.5rem;
-        border: 1px solid #cbd5e0;
+        border-radius: var(--radius);
+        border: 1px solid var(--border-strong);
     }
 
     .insights-header {
@@ -512,22 +820,22 @@ def get_analyst_css():
         gap: 0.5rem;
         margin-bottom: 0.75rem;
         font-weight: 600;
-        color: #2d3748;
+        color: var(--text);
     }
 
     .insight-item {
         margin: 0.5rem 0;
         padding: 0.5rem;
         background: white;
-        border-radius: 0.375rem;
-        border-left: 3px solid #667eea;
+        border-radius: var(--radius-sm);
+        border-left: 3px solid var(--brand);
     }
 
     .recommendations-section {
         margin-top: 1rem;
         padding: 1rem;
         background: #e6fffa;
-        border-radius: 0.5rem;
+        border-radius: var(--radius);
         border: 1px solid #81e6d9;
     }
 
@@ -535,8 +843,8 @@ def get_analyst_css():
         margin: 0.5rem 0;
         padding: 0.5rem;
         background: white;
-        border-radius: 0.375rem;
-        border-left: 3px solid #10b981;
+        border-radius: var(--radius-sm);
+        border-left: 3px solid var(--success);
     }
 
     /* Error Message */
@@ -545,69 +853,13 @@ def get_analyst_css():
         padding: 1rem;
         background: #fed7d7;
         border: 1px solid #fc8181;
-        border-radius: 0.5rem;
-        color: #742a2a;
+        border-radius: var(--radius);
+        color: var(--error-text);
     }
 
     .error-section h4 {
         margin-bottom: 0.5rem;
-        color: #742a2a;
-    }
-
-    /* Input Section */
-    .input-section {
-        padding: 1.5rem;
-        border-top: 1px solid #e2e8f0;
-        background: #f7fafc;
-    }
-
-    .input-container {
-        display: flex;
-        gap: 1rem;
-        align-items: flex-end;
-    }
-
-    #queryInput {
-        flex: 1;
-        padding: 0.75rem;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.5rem;
-        background: white;
-        color: #2d3748;
-        font-size: 0.875rem;
-        font-family: inherit;
-        resize: none;
-        transition: all 0.2s;
-    }
-
-    #queryInput:focus {
-        outline: none;
-        border-color: #667eea;
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
-
-    #sendButton {
-        display: flex;
-        align-items: center;
-        gap: 0.5rem;
-        padding: 0.75rem 1.5rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 0.5rem;
-        font-weight: 600;
-        cursor: pointer;
-        transition: all 0.2s;
-    }
-
-    #sendButton:hover:not(:disabled) {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.3);
-    }
-
-    #sendButton:disabled {
-        opacity: 0.5;
-        cursor: not-allowed;
+        color: var(--error-text);
     }
 
     /* Suggestions */
@@ -617,7 +869,7 @@ def get_analyst_css():
 
     .suggestions-label {
         font-size: 0.813rem;
-        color: #718096;
+        color: var(--text-subtle);
         font-weight: 500;
     }
 
@@ -631,18 +883,18 @@ def get_analyst_css():
     .suggestion-button {
         padding: 0.5rem 0.875rem;
         background: white;
-        border: 1px solid #e2e8f0;
-        border-radius: 0.375rem;
-        color: #4a5568;
+        border: var(--line);
+        border-radius: var(--radius-sm);
+        color: var(--text-muted);
         font-size: 0.813rem;
         cursor: pointer;
-        transition: all 0.2s;
+        transition: background-color 0.2s, border-color 0.2s, color 0.2s, transform 0.2s;
     }
 
     .suggestion-button:hover {
-        background: #f7fafc;
-        border-color: #667eea;
-        color: #667eea;
+        background: var(--bg-soft);
+        border-color: var(--brand);
+        color: var(--brand);
         transform: translateY(-1px);
     }
 
@@ -665,14 +917,14 @@ def get_analyst_css():
         padding: 2rem;
         border-radius: 0.75rem;
         text-align: center;
-        box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1);
+        box-shadow: 0 20px 25px -5px var(--shadow);
     }
 
     .spinner {
         width: 50px;
         height: 50px;
-        border: 4px solid #e2e8f0;
-        border-left-color: #667eea;
+        border: 4px solid var(--border);
+        border-left-color: var(--brand);
         border-radius: 50%;
         animation: spin 1s linear infinite;
         margin: 0 auto 1rem;
@@ -682,48 +934,47 @@ def get_analyst_css():
         to { transform: rotate(360deg); }
     }
 
-    /* Icon helper */
-    .icon {
-        display: inline-block;
-        font-size: 1rem;
+    /* Connection Test */
+    .test-step {
+        margin: 0.5rem 0;
+    }
+
+    .test-status {
+        margin-top: 1rem;
+    }
+
+    .test-status.ready {
+        color: var(--success);
+    }
+
+    .test-status.not-ready {
+        color: #ef4444;
     }
 
     /* DAX Query Display */
+    .dax-details {
+        margin-top: 1rem;
+    }
+
+    .dax-details summary {
+        cursor: pointer;
+        color: var(--brand);
+    }
+
     .dax-query {
         margin: 1rem 0;
         padding: 1rem;
-        background: #2d3748;
-        color: #e2e8f0;
-        border-radius: 0.5rem;
+        background: var(--text);
+        color: var(--border);
+        border-radius: var(--radius);
         font-family: 'Consolas', 'Monaco', monospace;
         font-size: 0.813rem;
         overflow-x: auto;
         white-space: pre-wrap;
     }
-
-    /* Responsive */
-    @media (max-width: 768px) {
-        .main-container {
-            padding: 1rem;
-        }
-        
-        .selector-container {
-            grid-template-columns: 1fr;
-        }
-        
-        .header-content {
-            flex-direction: column;
-            gap: 1rem;
-            align-items: flex-start;
-        }
-        
-        .message.user .message-content {
-            margin-left: 0;
-        }
-    }
     '''
 
-def get_analyst_javascript():
+def _build_analyst_javascript():
     """Return JavaScript code for the analyst interface"""
     return '''
     // Global state
@@ -732,97 +983,294 @@ def get_analyst_javascript():
     let sessionId = generateSessionId();
     let isProcessing = false;
 
+    // Shared formatter; toLocaleTimeString() builds a new one on every call
+    const TIME_FORMAT = new Intl.DateTimeFormat([], { hour: '2-digit', minute: '2-digit', second: '2-digit' });
+    let lastTimeSecond = -1;
+    let lastTimeText = '';
+
+    // Messages created in the same second share one formatted timestamp
+    function currentTime() {
+        const second = Math.floor(Date.now() / 1000);
+        if (second !== lastTimeSecond) {
+            lastTimeSecond = second;
+            lastTimeText = TIME_FORMAT.format(second * 1000);
+        }
+        return lastTimeText;
+    }
+
+    // Cached DOM references, assigned once on load
+    let $input, $send, $overlay = null, $msgs, $wsSel, $dsSel, $loadingMsg, $loadingTpl,
+        $suggestions, $suggestionBtns, $selInfo, $selName,
+        $msgTpl, $errorAnalysisTpl, $insightsTpl, $recommendationsTpl, $daxTpl;
+
+    // The deferred stylesheet is fetched as media="print" so it does not block
+    // the first paint; apply it as soon as it has loaded
+    const $deferredCss = document.getElementById('deferredCss');
+    if ($deferredCss.sheet) {
+        $deferredCss.media = 'all';
+    } else {
+        $deferredCss.addEventListener('load', () => { $deferredCss.media = 'all'; }, { once: true });
+    }
+
     // Initialize on load
     window.onload = async function() {
+        cacheDomRefs();
+        setupActions();
+        document.getElementById('welcomeTime').textContent = currentTime();
+        setupMessageHistory();
         console.log('Power BI Analyst initialized');
-        await checkConfiguration();
+        
+        // Listener wiring is not needed for first paint; run it when idle
+        (window.requestIdleCallback || setTimeout)(setupEventListeners);
+        
+        // The workspace list also reports whether Power BI is configured
         await loadWorkspaces();
-        setupEventListeners();
     };
 
     function generateSessionId() {
         return 'analyst_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
     }
 
-    function setupEventListeners() {
-        // Auto-resize textarea
-        const textarea = document.getElementById('queryInput');
-        textarea.addEventListener('input', function() {
-            this.style.height = 'auto';
-            this.style.height = Math.min(this.scrollHeight, 120) + 'px';
+    function cacheDomRefs() {
+        $input = document.getElementById('queryInput');
+        $send = document.getElementById('sendButton');
+        $msgs = document.getElementById('messagesContainer');
+        $wsSel = document.getElementById('workspaceSelect');
+        $dsSel = document.getElementById('datasetSelect');
+        $loadingTpl = document.getElementById('loadingTpl');
+        $suggestions = document.getElementById('suggestions');
+        $suggestionBtns = document.getElementById('suggestionButtons');
+        $selInfo = document.getElementById('selectionInfo');
+        $selName = document.getElementById('selectedDatasetName');
+        $msgTpl = document.getElementById('msgTpl');
+        $errorAnalysisTpl = document.getElementById('errorAnalysisTpl');
+        $insightsTpl = document.getElementById('insightsTpl');
+        $recommendationsTpl = document.getElementById('recommendationsTpl');
+        $daxTpl = document.getElementById('daxTpl');
+    }
+
+    function cloneTemplate(template) {
+        return template.content.cloneNode(true);
+    }
+
+    // Payloads for action buttons, keyed by the button so they are not copied
+    // into attributes and are released together with the message
+    const fixQueries = new WeakMap();
+
+    // Buttons name their handler in data-action; one body listener dispatches them
+    const ACTIONS = {
+        'test-connection': () => testConnection(),
+        'refresh-workspaces': () => refreshWorkspaces(),
+        'send-query': () => sendQuery(),
+        'apply-fix': target => applyFix(fixQueries.get(target))
+    };
+
+    // The controls are usable as soon as the page loads, so these are wired
+    // immediately rather than when idle
+    function setupActions() {
+        document.body.addEventListener('click', function(event) {
+            const target = event.target.closest('[data-action]');
+            if (!target || target.disabled) return;
+            
+            const action = ACTIONS[target.dataset.action];
+            if (action) action(target);
         });
         
-        // Example questions
-        document.querySelectorAll('.example-questions li').forEach(item => {
-            item.addEventListener('click', function() {
-                document.getElementById('queryInput').value = this.textContent;
-                document.getElementById('queryInput').focus();
+        $wsSel.addEventListener('change', onWorkspaceChange);
+        $dsSel.addEventListener('change', onDatasetChange);
+        $input.addEventListener('keydown', handleKeyPress);
+    }
+
+    function setupEventListeners() {
+        // Auto-resize textarea, at most once per animation frame. Growing text
+        // is measured as is; only shorter text resets the height first, since a
+        // smaller box shows up in scrollHeight only after that reset
+        let resizeFrame = 0;
+        let inputLength = 0;
+        $input.addEventListener('input', function() {
+            if (resizeFrame) return;
+            resizeFrame = requestAnimationFrame(() => {
+                resizeFrame = 0;
+                const shrank = $input.value.length < inputLength;
+                inputLength = $input.value.length;
+                if (shrank) $input.style.height = 'auto';
+                const height = Math.min($input.scrollHeight, 120) + 'px';
+                if ($input.style.height !== height) $input.style.height = height;
             });
         });
+        
+        // Example questions and suggestion buttons use one delegated listener
+        // each instead of a handler per element
+        $msgs.addEventListener('click', function(event) {
+            const item = event.target.closest('.example-questions li');
+            if (item) useQuestion(item.textContent);
+        });
+        
+        $suggestionBtns.addEventListener('click', function(event) {
+            const button = event.target.closest('.suggestion-button');
+            if (button) useQuestion(button.textContent);
+        });
     }
 
-    function showLoading(message = 'Processing...') {
-        document.getElementById('loadingMessage').textContent = message;
-        document.getElementById('loadingOverlay').style.display = 'flex';
+    function useQuestion(question) {
+        $input.value = question;
+        $input.focus();
     }
 
-    function hideLoading() {
-        document.getElementById('loadingOverlay').style.display = 'none';
+    // Only the most recent messages stay in the DOM; older ones are detached
+    // and restored in batches when the user scrolls back to the top
+    const MAX_DOM_MESSAGES = 50;
+    const HISTORY_RESTORE_BATCH = 20;
+    // Detached messages still pin their tables in memory, so the archive is
+    // bounded too and the oldest entries are dropped for good
+    const MAX_ARCHIVED_MESSAGES = 200;
+    const archivedMessages = [];
+    let historySentinel = null;
+
+    function setupMessageHistory() {
+        if (!('IntersectionObserver' in window)) return;
+        
+        historySentinel = document.createElement('div');
+        historySentinel.className = 'history-sentinel';
+        $msgs.prepend(historySentinel);
+        
+        const observer = new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) restoreArchivedMessages();
+        }, { root: $msgs });
+        observer.observe(historySentinel);
     }
 
-    async function checkConfiguration() {
-        try {
-            const response = await fetch('/analyst/api/check-config');
-            const result = await response.json();
-            
-            if (!result.configured) {
-                showError('Power BI is not configured. Please check your environment variables.');
-                document.getElementById('sendButton').disabled = true;
+    function appendMessage(messageDiv) {
+        // Animate only the new message, and drop the class afterwards so
+        // restored history is not animated again
+        messageDiv.classList.add('animate');
+        messageDiv.addEventListener('animationend', () => messageDiv.classList.remove('animate'), { once: true });
+        
+        // Messages added in the same frame are inserted together on the next
+        // one, and scrollIntoView uses the layout the browser computes anyway
+        pendingMessages.push(messageDiv);
+        if (pendingMessages.length === 1) requestAnimationFrame(flushMessages);
+    }
+
+    const pendingMessages = [];
+
+    function flushMessages() {
+        const frag = document.createDocumentFragment();
+        for (let i = 0; i < pendingMessages.length; i++) {
+            frag.appendChild(pendingMessages[i]);
+        }
+        const last = pendingMessages[pendingMessages.length - 1];
+        pendingMessages.length = 0;
+        
+        $msgs.appendChild(frag);
+        trimMessageHistory();
+        last.scrollIntoView({ block: 'end' });
+    }
+
+    function trimMessageHistory() {
+        // Without the observer there is no way back, so old messages are simply removed
+        if (!historySentinel) {
+            while ($msgs.childElementCount > MAX_DOM_MESSAGES) {
+                $msgs.firstElementChild.remove();
             }
-        } catch (error) {
-            console.error('Configuration check failed:', error);
+            return;
+        }
+        
+        // Children are the sentinel followed by the messages
+        let excess = $msgs.childElementCount - 1 - MAX_DOM_MESSAGES;
+        while (excess-- > 0) {
+            const oldest = historySentinel.nextElementSibling;
+            archivedMessages.push(oldest);
+            oldest.remove();
+        }
+        
+        if (archivedMessages.length > MAX_ARCHIVED_MESSAGES) {
+            archivedMessages.splice(0, archivedMessages.length - MAX_ARCHIVED_MESSAGES);
         }
     }
 
-    async function loadWorkspaces() {
-        showLoading('Loading workspaces...');
+    function restoreArchivedMessages() {
+        if (archivedMessages.length === 0) return;
         
-        try {
-            const response = await fetch('/analyst/api/workspaces');
+        const batch = archivedMessages.splice(-HISTORY_RESTORE_BATCH);
+        const frag = document.createDocumentFragment();
+        batch.forEach(node => frag.appendChild(node));
+        
+        // Keep the visible content in place while older messages are prepended
+        const previousHeight = $msgs.scrollHeight;
+        historySentinel.after(frag);
+        $msgs.scrollTop += $msgs.scrollHeight - previousHeight;
+    }
+
+    function showLoading(message = 'Processing...') {
+        if ($overlay === null) {
+            $overlay = $loadingTpl.content.firstElementChild.cloneNode(true);
+            $loadingMsg = $overlay.querySelector('.loading-message');
+            document.body.appendChild($overlay);
+        }
+        $loadingMsg.textContent = message;
+        $overlay.classList.remove('hidden');
+    }
+
+    function hideLoading() {
+        if ($overlay !== null) $overlay.classList.add('hidden');
+    }
+
+    // In-flight list requests; a newer request aborts the one it supersedes
+    let workspacesAbort = null;
+    let datasetsAbort = null;
+
+    function cancelDatasetsLoad() {
+        if (!datasetsAbort) return;
+        datasetsAbort.abort();
+        datasetsAbort = null;
+        hideLoading();
+    }
+
+    async function loadWorkspaces(refresh = false) {
+        if (workspacesAbort) workspacesAbort.abort();
+        const controller = workspacesAbort = new AbortController();
+        showLoading('Loading workspaces...');
+        
+        try {
+            const url = new URL('/analyst/api/workspaces', location.origin);
+            if (refresh) url.searchParams.set('refresh', 'true');
+            
+            const response = await fetch(url, { signal: controller.signal });
             const result = await response.json();
             
-            const select = document.getElementById('workspaceSelect');
-            select.innerHTML = '<option value="">Select a workspace...</option>';
+            const select = $wsSel;
             
-            if (result.status === 'success' && result.workspaces) {
-                result.workspaces.forEach(workspace => {
-                    const option = document.createElement('option');
-                    option.value = workspace.id;
-                    option.textContent = workspace.name;
-                    option.dataset = workspace;
-                    select.appendChild(option);
-                });
-                
-                if (result.workspaces.length === 0) {
-                    select.innerHTML = '<option value="">No workspaces available</option>';
-                }
+            if (result.configured === false) {
+                resetSelect(select, 'Select a workspace...');
+                showError('Power BI is not configured. Please check your environment variables.');
+                $send.disabled = true;
+            } else if (result.status === 'success' && result.workspaces) {
+                fillSelect(select, result.workspaces, 'Select a workspace...', 'No workspaces available');
             } else {
+                resetSelect(select, 'Select a workspace...');
                 showError('Failed to load workspaces: ' + (result.error || 'Unknown error'));
             }
         } catch (error) {
-            showError('Failed to load workspaces: ' + error.message);
+            if (error.name !== 'AbortError') {
+                showError('Failed to load workspaces: ' + error.message);
+            }
         } finally {
-            hideLoading();
+            if (workspacesAbort === controller) {
+                workspacesAbort = null;
+                hideLoading();
+            }
         }
     }
 
     async function onWorkspaceChange() {
-        const select = document.getElementById('workspaceSelect');
+        const select = $wsSel;
         const workspaceId = select.value;
         
         if (!workspaceId) {
-            document.getElementById('datasetSelect').innerHTML = '<option value="">Select a workspace first</option>';
-            document.getElementById('sendButton').disabled = true;
+            cancelDatasetsLoad();
+            resetSelect($dsSel, 'Select a workspace first');
+            $send.disabled = true;
             return;
         }
         
@@ -835,44 +1283,196 @@ def get_analyst_javascript():
     }
 
     async function loadDatasets(workspaceId, workspaceName) {
-        showLoading('Loading datasets...');
+        // A fresh list is used as is; a stale one is shown right away and
+        // revalidated with its ETag in the background
+        const cached = getCachedDatasets(workspaceId);
+        if (cached) {
+            renderDatasets(cached.datasets);
+            if (isFreshEntry(cached)) {
+                cancelDatasetsLoad();
+                return;
+            }
+        }
+        
+        if (datasetsAbort) datasetsAbort.abort();
+        const controller = datasetsAbort = new AbortController();
+        if (!cached) showLoading('Loading datasets...');
         
         try {
-            const response = await fetch(`/analyst/api/datasets?workspace_id=${workspaceId}&workspace_name=${encodeURIComponent(workspaceName)}`);
-            const result = await response.json();
+            const url = new URL('/analyst/api/datasets', location.origin);
+            url.searchParams.set('workspace_id', workspaceId);
+            url.searchParams.set('workspace_name', workspaceName);
+            
+            const headers = {};
+            if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+            
+            const response = await fetch(url, { headers: headers, signal: controller.signal });
+            if (response.status === 304) {
+                cacheDatasets(workspaceId, cached.datasets, cached.etag);
+                return;
+            }
             
-            const select = document.getElementById('datasetSelect');
-            select.innerHTML = '<option value="">Select a dataset...</option>';
+            const result = await response.json();
             
             if (result.status === 'success' && result.datasets) {
-                result.datasets.forEach(dataset => {
-                    const option = document.createElement('option');
-                    option.value = dataset.id;
-                    option.textContent = dataset.name;
-                    select.appendChild(option);
-                });
-                
-                if (result.datasets.length === 0) {
-                    select.innerHTML = '<option value="">No datasets available in this workspace</option>';
-                }
-            } else {
+                cacheDatasets(workspaceId, result.datasets, response.headers.get('ETag'));
+                renderDatasets(result.datasets);
+            } else if (!cached) {
+                resetSelect($dsSel, 'Select a dataset...');
                 showError('Failed to load datasets: ' + (result.error || 'Unknown error'));
             }
         } catch (error) {
-            showError('Failed to load datasets: ' + error.message);
+            if (error.name !== 'AbortError' && !cached) {
+                showError('Failed to load datasets: ' + error.message);
+            }
         } finally {
-            hideLoading();
+            if (datasetsAbort === controller) {
+                datasetsAbort = null;
+                hideLoading();
+            }
         }
     }
 
+    function renderDatasets(datasets) {
+        fillSelect($dsSel, datasets, 'Select a dataset...', 'No datasets available in this workspace');
+        
+        // A background revalidation must not drop the dataset the user picked
+        if (currentDataset && datasets.some(dataset => dataset.id === currentDataset.id)) {
+            $dsSel.value = currentDataset.id;
+        }
+    }
+
+    // Replace a select's options with a single empty-state placeholder
+    function resetSelect(select, text) {
+        select.replaceChildren(new Option(text, ''));
+    }
+
+    // Fill a select with {id, name} items behind a placeholder, or show the
+    // empty-state text when there are none
+    function fillSelect(select, items, placeholder, emptyText) {
+        if (items.length === 0) {
+            resetSelect(select, emptyText);
+            return;
+        }
+        
+        const frag = document.createDocumentFragment();
+        frag.appendChild(new Option(placeholder, ''));
+        for (let i = 0; i < items.length; i++) {
+            frag.appendChild(new Option(items[i].name, items[i].id));
+        }
+        select.replaceChildren(frag);
+    }
+
+    // Dataset lists per workspace, kept for the session (mirrors the server's 5 minute cache).
+    // The Map is kept in least-recently-used order and bounded.
+    const DATASET_CACHE_TTL = 5 * 60 * 1000;
+    const DATASET_CACHE_MAX = 50;
+    const DATASET_CACHE_PREFIX = 'analyst_datasets_';
+    const datasetCache = new Map();
+    const runWhenIdle = window.requestIdleCallback || setTimeout;
+
+    // Other open analyst tabs share fetched lists and refreshes in memory
+    const datasetChannel = 'BroadcastChannel' in window ? new BroadcastChannel('analyst_datasets') : null;
+    if (datasetChannel) {
+        datasetChannel.onmessage = event => {
+            const { workspaceId, entry } = event.data;
+            if (workspaceId) {
+                storeDatasets(workspaceId, entry);
+            } else {
+                // sessionStorage is per tab, so this tab's copies go too
+                datasetCache.clear();
+                clearStoredDatasets();
+            }
+        };
+    }
+
+    function getCachedDatasets(workspaceId) {
+        let entry = datasetCache.get(workspaceId);
+        
+        if (!entry) {
+            try {
+                entry = JSON.parse(sessionStorage.getItem(DATASET_CACHE_PREFIX + workspaceId));
+            } catch (error) {
+                entry = null;
+            }
+            if (!entry) return null;
+        }
+        
+        // Move to the most recently used end
+        datasetCache.delete(workspaceId);
+        datasetCache.set(workspaceId, entry);
+        return entry;
+    }
+
+    function isFreshEntry(entry) {
+        return Date.now() - entry.time <= DATASET_CACHE_TTL;
+    }
+
+    function cacheDatasets(workspaceId, datasets, etag) {
+        const entry = { time: Date.now(), datasets: datasets, etag: etag || null };
+        storeDatasets(workspaceId, entry);
+        if (datasetChannel) datasetChannel.postMessage({ workspaceId: workspaceId, entry: entry });
+    }
+
+    // Keep an entry in memory (evicting the least recently used) and in sessionStorage
+    function storeDatasets(workspaceId, entry) {
+        datasetCache.delete(workspaceId);
+        datasetCache.set(workspaceId, entry);
+        
+        const evicted = [];
+        while (datasetCache.size > DATASET_CACHE_MAX) {
+            const oldest = datasetCache.keys().next().value;
+            datasetCache.delete(oldest);
+            evicted.push(oldest);
+        }
+        
+        // Serializing and storing is synchronous, so keep it off the render path
+        runWhenIdle(() => {
+            try {
+                for (let i = 0; i < evicted.length; i++) {
+                    sessionStorage.removeItem(DATASET_CACHE_PREFIX + evicted[i]);
+                }
+                // Skip entries that a refresh cleared or a newer fetch replaced meanwhile
+                if (datasetCache.get(workspaceId) !== entry) return;
+                sessionStorage.setItem(DATASET_CACHE_PREFIX + workspaceId, JSON.stringify(entry));
+            } catch (error) {
+                // Storage full or unavailable; the in-memory cache still applies
+            }
+        });
+    }
+
+    function clearDatasetCache() {
+        datasetCache.clear();
+        if (datasetChannel) datasetChannel.postMessage({});
+        clearStoredDatasets();
+    }
+
+    function clearStoredDatasets() {
+        try {
+            for (let i = sessionStorage.length - 1; i >= 0; i--) {
+                const key = sessionStorage.key(i);
+                if (key && key.startsWith(DATASET_CACHE_PREFIX)) {
+                    sessionStorage.removeItem(key);
+                }
+            }
+        } catch (error) {
+            // Storage unavailable
+        }
+    }
+
+    function refreshWorkspaces() {
+        clearDatasetCache();
+        loadWorkspaces(true);
+    }
+
     function onDatasetChange() {
-        const select = document.getElementById('datasetSelect');
+        const select = $dsSel;
         const datasetId = select.value;
         
         if (!datasetId) {
             currentDataset = null;
-            document.getElementById('sendButton').disabled = true;
-            document.getElementById('selectionInfo').style.display = 'none';
+            $send.disabled = true;
+            $selInfo.classList.add('hidden');
             return;
         }
         
@@ -881,10 +1481,15 @@ def get_analyst_javascript():
             name: select.options[select.selectedIndex].text
         };
         
-        // Update UI
-        document.getElementById('selectedDatasetName').textContent = currentDataset.name;
-        document.getElementById('selectionInfo').style.display = 'block';
-        document.getElementById('sendButton').disabled = false;
+        // Update UI, writing only what changed
+        if ($selName.textContent !== currentDataset.name) {
+            $selName.textContent = currentDataset.name;
+        }
+        $selInfo.classList.remove('hidden');
+        $send.disabled = false;
+        
+        // A question usually follows, so have the server load the schema now
+        prefetchMetadata(datasetId);
         
         // Show suggestions
         showSuggestions([
@@ -894,39 +1499,66 @@ def get_analyst_javascript():
         ]);
     }
 
+    let metadataPrefetchAbort = null;
+
+    function prefetchMetadata(datasetId) {
+        if (metadataPrefetchAbort) metadataPrefetchAbort.abort();
+        const controller = metadataPrefetchAbort = new AbortController();
+        
+        runWhenIdle(() => {
+            if (controller.signal.aborted) return;
+            fetch('/analyst/api/prefetch-metadata', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ dataset_id: datasetId }),
+                priority: 'low',
+                signal: controller.signal
+            }).catch(() => {
+                // Best effort; the analysis fetches the metadata itself if needed
+            });
+        });
+    }
+
     function showSuggestions(questions) {
-        const container = document.getElementById('suggestionButtons');
-        container.innerHTML = '';
+        const frag = document.createDocumentFragment();
         
         questions.forEach(question => {
             const button = document.createElement('button');
             button.className = 'suggestion-button';
             button.textContent = question;
-            button.onclick = () => {
-                document.getElementById('queryInput').value = question;
-                document.getElementById('queryInput').focus();
-            };
-            container.appendChild(button);
+            frag.appendChild(button);
         });
         
-        document.getElementById('suggestions').style.display = 'block';
+        $suggestionBtns.replaceChildren(frag);
+        $suggestions.classList.remove('hidden');
     }
 
     function handleKeyPress(event) {
-        if (event.key === 'Enter' && !event.shiftKey && !isProcessing) {
+        if (event.key === 'Enter' && !event.shiftKey) {
             event.preventDefault();
             sendQuery();
         }
     }
 
+    let analyzeAbort = null;
+
+    // Analyses and fixes run independently; the page stays busy (and keeps its
+    // loading overlay) until neither is in flight
+    function settleProcessing() {
+        isProcessing = !!(analyzeAbort || fixAbort);
+        if (!isProcessing) hideLoading();
+    }
+
     async function sendQuery() {
-        const input = document.getElementById('queryInput');
+        const input = $input;
         const query = input.value.trim();
         
-        if (!query || !currentDataset || isProcessing) return;
+        if (!query || !currentDataset) return;
         
+        // A new question supersedes one that is still running
+        if (analyzeAbort) analyzeAbort.abort();
+        const controller = analyzeAbort = new AbortController();
         isProcessing = true;
-        document.getElementById('sendButton').disabled = true;
         
         // Add user message
         addMessage(query, 'user');
@@ -940,17 +1572,25 @@ def get_analyst_javascript():
             const response = await fetch('/analyst/api/analyze', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Accept': NDJSON_CONTENT_TYPE
                 },
                 body: JSON.stringify({
                     query: query,
                     dataset_id: currentDataset.id,
                     dataset_name: currentDataset.name,
                     session_id: sessionId
-                })
+                }),
+                signal: controller.signal
             });
             
-            const result = await response.json();
+            // Successful analyses stream; errors come back as a single JSON document
+            if (isNdjson(response)) {
+                await readAnalysisStream(response);
+                return;
+            }
+            
+            const result = await readResult(response);
             
             if (result.status === 'success') {
                 handleAnalysisResult(result);
@@ -958,186 +1598,397 @@ def get_analyst_javascript():
                 showError(result.error || 'Analysis failed');
             }
         } catch (error) {
-            showError('Failed to analyze query: ' + error.message);
+            if (error.name !== 'AbortError') {
+                showError('Failed to analyze query: ' + error.message);
+            }
         } finally {
-            hideLoading();
-            isProcessing = false;
-            document.getElementById('sendButton').disabled = false;
-            input.focus();
+            if (analyzeAbort === controller) {
+                analyzeAbort = null;
+                settleProcessing();
+                input.focus();
+            }
         }
     }
 
-    function handleAnalysisResult(result) {
-        const container = document.getElementById('messagesContainer');
-        const messageDiv = document.createElement('div');
-        messageDiv.className = 'message assistant';
+    // Show the table as soon as its rows arrive and add the insights when the
+    // server has finished analysing them
+    async function readAnalysisStream(response) {
+        let meta = null;
+        let table = null;
+        let content = null;
         
-        const time = new Date().toLocaleTimeString();
-        let content = `
-            <div class="message-header">
-                <span class="icon">🤖</span>
-                <span class="name">Power BI Analyst</span>
-                <span class="time">${time}</span>
-            </div>
-            <div class="message-content">
-        `;
+        await readNdjson(response, event => {
+            if (event.type === 'meta') {
+                meta = event;
+            } else if (event.type === 'rows' && event.rows.length > 0) {
+                if (table) {
+                    queueTableRows(table, event.rows);
+                } else {
+                    table = prepareTable(event.rows, meta.column_types);
+                    content = handleAnalysisResult(Object.assign({ table: table }, meta));
+                    if (!fixAbort) hideLoading();
+                }
+            } else if (event.type === 'insights') {
+                if (!content) content = handleAnalysisResult(meta);
+                addInsights(content, event.insights);
+                showFollowUps(event.follow_up_queries);
+            } else if (event.type === 'error') {
+                if (!content && meta) content = handleAnalysisResult(meta);
+                showError('Analysis failed: ' + event.error);
+            }
+        });
+        
+        if (!content && meta) handleAnalysisResult(meta);
+    }
+
+    function handleAnalysisResult(result) {
+        const messageDiv = createMessage('assistant', '🤖', 'Power BI Analyst');
+        const content = messageDiv.lastElementChild;
         
         // Handle different query types
         if (result.query_type === 'error_with_analysis') {
-            content += `
-                <div class="error-section">
-                    <h4>❌ Query Error</h4>
-                    <p>${escapeHtml(result.error)}</p>
-                </div>
-                
-                <div class="insights-section">
-                    <div class="insights-header">
-                        <span class="icon">🔧</span>
-                        <span>Error Analysis</span>
-                    </div>
-                    <p><strong>Issue:</strong> ${escapeHtml(result.error_analysis.explanation)}</p>
-                    <p><strong>Fix:</strong> ${escapeHtml(result.error_analysis.suggested_fix)}</p>
-                    
-                    <button class="suggestion-button" onclick="applyFix('${escapeHtml(result.error_analysis.fixed_query)}')">
-                        Apply Suggested Fix
-                    </button>
-                </div>
-            `;
+            const analysis = result.error_analysis || {};
+            const section = cloneTemplate($errorAnalysisTpl);
+            // One lookup for all fields; results come back in document order
+            const [errorText, issue, fix, applyButton] =
+                section.querySelectorAll('.error-text, .issue, .fix, .apply-fix');
+            errorText.textContent = result.error;
+            issue.textContent = analysis.explanation || '';
+            fix.textContent = analysis.suggested_fix || 
+                (analysis.alternative_approaches || []).join('; ');
+            fixQueries.set(applyButton, analysis.fixed_query || '');
+            content.appendChild(section);
         } else if (result.query_type === 'analysis_complete') {
             // Show explanation
-            content += `<p>${escapeHtml(result.explanation)}</p>`;
+            content.appendChild(el('p', null, result.explanation));
             
             // Show data if available
-            if (result.data && result.data.length > 0) {
-                content += createDataTable(result.data);
+            if (result.table) {
+                content.appendChild(createDataTable(result.table));
+                if (result.truncated) {
+                    // A streamed table starts with its first batch; count the whole preview
+                    const shown = result.preview_rows || result.table.rowCount;
+                    content.appendChild(el('p', 'table-note',
+                        `Showing the first ${shown} of ${result.row_count} rows`));
+                }
             }
             
             // Show insights
             if (result.insights) {
-                content += `
-                    <div class="insights-section">
-                        <div class="insights-header">
-                            <span class="icon">💡</span>
-                            <span>Key Insights</span>
-                        </div>
-                `;
-                
-                if (result.insights.insights && result.insights.insights.length > 0) {
-                    result.insights.insights.forEach(insight => {
-                        content += `<div class="insight-item">${escapeHtml(insight)}</div>`;
-                    });
-                }
-                
-                content += '</div>';
-                
-                // Show recommendations
-                if (result.insights.recommendations && result.insights.recommendations.length > 0) {
-                    content += `
-                        <div class="recommendations-section">
-                            <div class="insights-header">
-                                <span class="icon">🎯</span>
-                                <span>Recommendations</span>
-                            </div>
-                    `;
-                    
-                    result.insights.recommendations.forEach((rec, idx) => {
-                        content += `<div class="recommendation-item">${idx + 1}. ${escapeHtml(rec)}</div>`;
-                    });
-                    
-                    content += '</div>';
-                }
+                addInsights(content, result.insights);
             }
             
             // Show DAX query (collapsible)
             if (result.dax_query) {
-                content += `
-                    <details style="margin-top: 1rem;">
-                        <summary style="cursor: pointer; color: #667eea;">View DAX Query</summary>
-                        <div class="dax-query">${escapeHtml(result.dax_query)}</div>
-                    </details>
-                `;
+                const dax = cloneTemplate($daxTpl);
+                dax.querySelector('.dax-query').textContent = result.dax_query;
+                content.appendChild(dax);
             }
             
-            // Update suggestions with follow-up queries
-            if (result.follow_up_queries && result.follow_up_queries.length > 0) {
-                const questions = result.follow_up_queries.map(q => q.question);
-                showSuggestions(questions);
-            }
+            showFollowUps(result.follow_up_queries);
         }
         
-        content += '</div>';
-        messageDiv.innerHTML = content;
-        container.appendChild(messageDiv);
-        container.scrollTop = container.scrollHeight;
+        appendMessage(messageDiv);
+        return content;
     }
 
-    function createDataTable(data) {
-        if (!data || data.length === 0) return '';
+    // Insights and recommendations go above the DAX query, which may already be shown
+    function addInsights(content, result) {
+        const frag = document.createDocumentFragment();
+        const insights = cloneTemplate($insightsTpl);
+        const insightsSection = insights.firstElementChild;
         
-        const columns = Object.keys(data[0]);
-        const maxRows = 20;
+        if (result.insights && result.insights.length > 0) {
+            renderInChunks(result.insights, 
+                           insight => el('div', 'insight-item', insight), insightsSection);
+        }
         
-        let html = `
-            <div class="data-table">
-                <table>
-                    <thead>
-                        <tr>
-        `;
+        frag.appendChild(insights);
         
-        columns.forEach(col => {
-            html += `<th>${escapeHtml(col)}</th>`;
-        });
+        // Show recommendations
+        if (result.recommendations && result.recommendations.length > 0) {
+            const recommendations = cloneTemplate($recommendationsTpl);
+            const recommendationsSection = recommendations.firstElementChild;
+            
+            renderInChunks(result.recommendations, 
+                           (rec, idx) => el('div', 'recommendation-item', `${idx + 1}. ${rec}`),
+                           recommendationsSection);
+            
+            frag.appendChild(recommendations);
+        }
         
-        html += `
-                        </tr>
-                    </thead>
-                    <tbody>
-        `;
-        
-        data.slice(0, maxRows).forEach(row => {
-            html += '<tr>';
-            columns.forEach(col => {
-                const value = row[col];
-                const displayValue = value === null ? 'null' : 
-                                   typeof value === 'number' ? formatNumber(value) : 
-                                   String(value);
-                html += `<td>${escapeHtml(displayValue)}</td>`;
-            });
-            html += '</tr>';
-        });
+        // The DAX query, when shown, is always the last element of the message
+        const last = content.lastElementChild;
+        content.insertBefore(frag, last && last.classList.contains('dax-details') ? last : null);
+    }
+
+    // Update suggestions with follow-up queries
+    function showFollowUps(followUps) {
+        if (followUps && followUps.length > 0) {
+            showSuggestions(followUps.map(q => q.question));
+        }
+    }
+
+    // Tables render only the rows in view plus some overscan; spacer rows
+    // stand in for the rest so the scrollbar reflects the full result
+    const TABLE_ROW_HEIGHT = 45;
+    const TABLE_VISIBLE_ROWS = 10;
+    const TABLE_OVERSCAN = 5;
+
+    function createDataTable(table) {
+        const columns = table.columns;
+        const columnText = table.columnText;
+        const wrapper = el('div', 'data-table virtual');
+        const tableEl = document.createElement('table');
+        const headRow = tableEl.createTHead().insertRow();
+        const tbody = tableEl.createTBody();
         
-        html += `
-                    </tbody>
-                </table>
-        `;
+        // Header cells take the column names as text, so nothing needs escaping
+        for (let c = 0; c < columns.length; c++) {
+            headRow.appendChild(el('th', null, columns[c]));
+        }
+        wrapper.appendChild(tableEl);
         
-        if (data.length > maxRows) {
-            html += `<p style="text-align: center; color: #718096; margin-top: 0.5rem;">
-                        Showing ${maxRows} of ${data.length} rows
-                     </p>`;
+        let rowHeight = TABLE_ROW_HEIGHT;
+        let measured = false;
+        let renderedStart = -1;
+        let renderedCount = -1;
+        
+        // Rows are created once and reused as the window moves; only their
+        // cell text changes on scroll
+        const rowPool = [];
+        
+        // Spacer rows stand in for the rows above and below the window
+        const topSpacer = spacerRow();
+        const bottomSpacer = spacerRow();
+        
+        function spacerRow() {
+            const row = el('tr', 'spacer');
+            row.appendChild(el('td')).colSpan = columns.length;
+            return row;
         }
         
-        html += '</div>';
+        function renderWindow(force) {
+            if (!measured) {
+                // Rows are nowrap, so one measurement holds for the whole table
+                const row = topSpacer.nextElementSibling;
+                if (row && row !== bottomSpacer && row.offsetHeight) {
+                    rowHeight = row.offsetHeight;
+                    measured = true;
+                    renderedStart = -1;
+                }
+            }
+            
+            const start = Math.max(0, Math.floor(wrapper.scrollTop / rowHeight) - TABLE_OVERSCAN);
+            if (start === renderedStart && force !== true) return;
+            renderedStart = start;
+            
+            const rowCount = table.rowCount;
+            const end = Math.min(rowCount, start + TABLE_VISIBLE_ROWS + 2 * TABLE_OVERSCAN);
+            const count = end - start;
+            
+            while (rowPool.length < count) {
+                const row = document.createElement('tr');
+                for (let c = 0; c < columnText.length; c++) {
+                    row.appendChild(document.createElement('td'));
+                }
+                rowPool.push(row);
+            }
+            
+            // Cell text is assigned directly, so values never pass through the HTML parser
+            for (let r = 0; r < count; r++) {
+                const cells = rowPool[r].cells;
+                for (let c = 0; c < columnText.length; c++) {
+                    cells[c].textContent = columnText[c][start + r];
+                }
+            }
+            
+            topSpacer.style.height = start * rowHeight + 'px';
+            bottomSpacer.style.height = (rowCount - end) * rowHeight + 'px';
+            
+            // The set of rows only changes when the window size does
+            if (count !== renderedCount) {
+                renderedCount = count;
+                tbody.replaceChildren(topSpacer, ...rowPool.slice(0, count), bottomSpacer);
+            }
+        }
+        
+        // Scroll events can outpace frames; render at most once per frame
+        let scrollFrame = 0;
+        function onScroll() {
+            if (scrollFrame) return;
+            scrollFrame = requestAnimationFrame(() => {
+                scrollFrame = 0;
+                renderWindow();
+            });
+        }
         
-        return html;
+        renderWindow();
+        wrapper.addEventListener('scroll', onScroll, { passive: true });
+        tableViews.set(table, renderWindow);
+        
+        return wrapper;
+    }
+
+    // Rendered tables by their data, so streamed rows can refresh the view
+    const tableViews = new WeakMap();
+
+    function refreshDataTable(table) {
+        const renderWindow = tableViews.get(table);
+        if (renderWindow) renderWindow(true);
     }
 
+    // Streamed rows are formatted and shown once per frame rather than per
+    // batch, with a cap on how many are formatted in a single frame
+    const TABLE_ROWS_PER_FRAME = 2000;
+    const pendingTableRows = new Map();
+    let tableRowsFrame = 0;
+
+    function queueTableRows(table, rows) {
+        const batches = pendingTableRows.get(table);
+        if (batches) batches.push(rows);
+        else pendingTableRows.set(table, [rows]);
+        
+        if (!tableRowsFrame) tableRowsFrame = requestAnimationFrame(flushTableRows);
+    }
+
+    function flushTableRows() {
+        tableRowsFrame = 0;
+        let budget = TABLE_ROWS_PER_FRAME;
+        
+        for (const [table, batches] of pendingTableRows) {
+            if (budget <= 0) break;
+            
+            while (batches.length > 0 && budget > 0) {
+                let rows = batches.shift();
+                if (rows.length > budget) {
+                    batches.unshift(rows.slice(budget));
+                    rows = rows.slice(0, budget);
+                }
+                appendTableRows(table, rows);
+                budget -= rows.length;
+            }
+            
+            refreshDataTable(table);
+            if (batches.length === 0) pendingTableRows.delete(table);
+        }
+        
+        if (pendingTableRows.size > 0) tableRowsFrame = requestAnimationFrame(flushTableRows);
+    }
+
+    // Shared number formatters; toLocaleString() builds a new one per cell
+    const NUMBER_FORMAT_LARGE = new Intl.NumberFormat('en-US', { maximumFractionDigits: 2 });
+    const NUMBER_FORMAT_SMALL = new Intl.NumberFormat('en-US', { maximumFractionDigits: 4 });
+
     function formatNumber(num) {
         if (num === null || num === undefined) return 'null';
         if (typeof num !== 'number') return String(num);
         
-        // Format large numbers with commas
-        if (Math.abs(num) >= 1000) {
-            return num.toLocaleString('en-US', { maximumFractionDigits: 2 });
+        // Large numbers get thousands separators and 2 decimals, small ones up to 4
+        return Math.abs(num) >= 1000 ? NUMBER_FORMAT_LARGE.format(num) : NUMBER_FORMAT_SMALL.format(num);
+    }
+
+    // Transpose rows into display strings per column, deciding once per
+    // column whether it is numeric instead of testing every cell
+    function prepareTable(data, columnTypes) {
+        const columns = Object.keys(data[0]);
+        const table = { columns: columns, columnText: [], numeric: [], rowCount: 0 };
+        
+        for (let c = 0; c < columns.length; c++) {
+            const col = columns[c];
+            let isNumeric = false;
+            if (columnTypes && columnTypes.length === columns.length) {
+                // The server already classified the columns
+                isNumeric = columnTypes[c] === 'number';
+            } else for (let i = 0; i < data.length; i++) {
+                const v = data[i][col];
+                if (v == null) continue;
+                isNumeric = typeof v === 'number';
+                if (!isNumeric) break;
+            }
+            table.columnText.push([]);
+            table.numeric.push(isNumeric);
         }
         
-        // For small decimals, show up to 4 decimal places
-        return num.toLocaleString('en-US', { maximumFractionDigits: 4 });
+        appendTableRows(table, data);
+        return table;
+    }
+
+    // Row appenders generated per schema, so each cell is a direct property
+    // read instead of a lookup by a key held in a variable
+    const rowAppenders = new Map();
+
+    function compileRowAppender(columns, numeric) {
+        const body = ['let v'];
+        for (let c = 0; c < columns.length; c++) {
+            const format = numeric[c] ? 'formatNumber(v)' : 'String(v)';
+            body.push(`v = row[${JSON.stringify(columns[c])}]`,
+                      `text[${c}].push(v == null ? 'null' : ${format})`);
+        }
+        return new Function('formatNumber', 'text', 'row', body.join(';'));
+    }
+
+    function getRowAppender(table) {
+        const key = JSON.stringify([table.columns, table.numeric]);
+        let append = rowAppenders.get(key);
+        if (append === undefined) {
+            try {
+                append = compileRowAppender(table.columns, table.numeric);
+            } catch (error) {
+                // Code generation disallowed (e.g. by a CSP); use the generic loop
+                append = null;
+            }
+            rowAppenders.set(key, append);
+        }
+        return append;
+    }
+
+    // Add rows that arrive after the table was prepared
+    function appendTableRows(table, rows) {
+        const append = getRowAppender(table);
+        if (append) {
+            for (let i = 0; i < rows.length; i++) {
+                append(formatNumber, table.columnText, rows[i]);
+            }
+        } else {
+            const columns = table.columns;
+            for (let c = 0; c < columns.length; c++) {
+                const col = columns[c];
+                const text = table.columnText[c];
+                const numeric = table.numeric[c];
+                for (let i = 0; i < rows.length; i++) {
+                    const v = rows[i][col];
+                    text.push(v == null ? 'null' : numeric ? formatNumber(v) : String(v));
+                }
+            }
+        }
+        table.rowCount += rows.length;
+    }
+
+    // Single JSON bodies (errors and error analyses; successful results stream)
+    async function readResult(response) {
+        const result = await response.json();
+        if (Array.isArray(result.preview) && result.preview.length > 0) {
+            result.table = prepareTable(result.preview, result.column_types);
+        }
+        delete result.preview;
+        return result;
     }
 
+    // Fix and connection-test requests in flight; a new one aborts the old
+    let fixAbort = null;
+    let connectionTestAbort = null;
+
     async function applyFix(fixedQuery) {
-        if (!currentDataset || isProcessing) return;
+        if (!currentDataset) return;
         
+        // Applying a fix supersedes a running analysis, as a new question does
+        if (analyzeAbort) {
+            analyzeAbort.abort();
+            analyzeAbort = null;
+        }
+        if (fixAbort) fixAbort.abort();
+        const controller = fixAbort = new AbortController();
         isProcessing = true;
         showLoading('Applying fixed query...');
         
@@ -1145,141 +1996,207 @@ def get_analyst_javascript():
             const response = await fetch('/analyst/api/execute-dax', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Accept': NDJSON_CONTENT_TYPE
                 },
                 body: JSON.stringify({
                     dax_query: fixedQuery,
                     dataset_id: currentDataset.id,
                     dataset_name: currentDataset.name
-                })
+                }),
+                signal: controller.signal
             });
             
-            const result = await response.json();
-            
-            if (result.status === 'success') {
-                // Create a synthetic analysis result
-                const analysisResult = {
-                    query_type: 'analysis_complete',
-                    explanation: 'Query executed successfully after applying fix.',
-                    data: result.data,
-                    row_count: result.row_count,
-                    execution_time_ms: result.execution_time_ms,
-                    dax_query: fixedQuery
-                };
-                
-                handleAnalysisResult(analysisResult);
-            } else {
+            // Failures come back as a single JSON document
+            if (!isNdjson(response)) {
+                const result = await response.json();
                 showError('Fixed query still failed: ' + result.error);
+                return;
             }
+            
+            const analysisResult = {
+                query_type: 'analysis_complete',
+                explanation: 'Query executed successfully after applying fix.',
+                dax_query: fixedQuery
+            };
+            let meta = {};
+            let table = null;
+            let failed = false;
+            
+            // Show the table as soon as the first rows arrive and grow it in place
+            await readNdjson(response, event => {
+                if (event.type === 'meta') meta = event;
+                if (event.type === 'error') {
+                    failed = true;
+                    showError('Failed to apply fix: ' + event.error);
+                }
+                if (event.type !== 'rows' || event.rows.length === 0) return;
+                
+                if (table) {
+                    queueTableRows(table, event.rows);
+                } else {
+                    table = prepareTable(event.rows, meta.column_types);
+                    handleAnalysisResult(Object.assign({ table: table }, meta, analysisResult));
+                    if (!analyzeAbort) hideLoading();
+                }
+            });
+            
+            if (!table && !failed) handleAnalysisResult(analysisResult);
         } catch (error) {
-            showError('Failed to apply fix: ' + error.message);
+            if (error.name !== 'AbortError') {
+                showError('Failed to apply fix: ' + error.message);
+            }
         } finally {
-            hideLoading();
-            isProcessing = false;
+            if (fixAbort === controller) {
+                fixAbort = null;
+                settleProcessing();
+            }
         }
     }
 
-    function addMessage(text, type) {
-        const container = document.getElementById('messagesContainer');
-        const messageDiv = document.createElement('div');
-        messageDiv.className = `message ${type}`;
-        
-        const time = new Date().toLocaleTimeString();
+    const NDJSON_CONTENT_TYPE = 'application/x-ndjson';
+
+    function isNdjson(response) {
+        return (response.headers.get('Content-Type') || '').includes(NDJSON_CONTENT_TYPE);
+    }
+
+    // Read a newline-delimited JSON body, handing each line over as it arrives
+    async function readNdjson(response, onEvent) {
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffered = '';
         
-        if (type === 'user') {
-            messageDiv.innerHTML = `
-                <div class="message-header">
-                    <span class="icon">👤</span>
-                    <span class="name">You</span>
-                    <span class="time">${time}</span>
-                </div>
-                <div class="message-content">${escapeHtml(text)}</div>
-            `;
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffered += value;
+            let newline;
+            while ((newline = buffered.indexOf('\\n')) >= 0) {
+                const line = buffered.slice(0, newline);
+                buffered = buffered.slice(newline + 1);
+                if (line) onEvent(JSON.parse(line));
+            }
         }
         
-        container.appendChild(messageDiv);
-        container.scrollTop = container.scrollHeight;
+        if (buffered.trim()) onEvent(JSON.parse(buffered));
     }
 
-    function showError(message) {
-        const container = document.getElementById('messagesContainer');
-        const messageDiv = document.createElement('div');
-        messageDiv.className = 'message assistant';
+    function el(tag, cls, text) {
+        const node = document.createElement(tag);
+        if (cls) node.className = cls;
+        if (text != null) node.textContent = text;
+        return node;
+    }
+
+    // Render long lists a chunk per frame so a large reply never blocks scrolling
+    function renderInChunks(items, makeNode, parent, chunkSize = 32) {
+        let i = 0;
         
-        const time = new Date().toLocaleTimeString();
+        function step() {
+            const end = Math.min(i + chunkSize, items.length);
+            const frag = document.createDocumentFragment();
+            for (; i < end; i++) {
+                frag.appendChild(makeNode(items[i], i));
+            }
+            parent.appendChild(frag);
+            
+            if (i < items.length) requestAnimationFrame(step);
+        }
         
-        messageDiv.innerHTML = `
-            <div class="message-header">
-                <span class="icon">🤖</span>
-                <span class="name">Power BI Analyst</span>
-                <span class="time">${time}</span>
-            </div>
-            <div class="message-content">
-                <div class="error-section">
-                    <h4>❌ Error</h4>
-                    <p>${escapeHtml(message)}</p>
-                </div>
-            </div>
-        `;
+        step();
+    }
+
+    // The skeleton is cloned directly and filled by position: header first
+    // (icon, name, time), content last
+    function createMessage(type, icon, name) {
+        const messageDiv = $msgTpl.content.firstElementChild.cloneNode(true);
+        const header = messageDiv.firstElementChild.children;
+        messageDiv.className = `message ${type}`;
+        header[0].textContent = icon;
+        header[1].textContent = name;
+        header[2].textContent = currentTime();
+        return messageDiv;
+    }
+
+    function addMessage(text, type) {
+        if (type !== 'user') return;
         
-        container.appendChild(messageDiv);
-        container.scrollTop = container.scrollHeight;
+        const messageDiv = createMessage('user', '👤', 'You');
+        messageDiv.lastElementChild.textContent = text;
+        appendMessage(messageDiv);
+    }
+
+    function showError(message) {
+        const messageDiv = createMessage('assistant', '🤖', 'Power BI Analyst');
+        const section = el('div', 'error-section');
+        section.append(el('h4', null, '❌ Error'), el('p', null, message));
+        messageDiv.lastElementChild.appendChild(section);
+        appendMessage(messageDiv);
     }
 
     async function testConnection() {
+        if (connectionTestAbort) connectionTestAbort.abort();
+        const controller = connectionTestAbort = new AbortController();
         showLoading('Testing Power BI connection...');
         
         try {
-            const response = await fetch('/analyst/api/test-connection');
+            const response = await fetch('/analyst/api/test-connection', { signal: controller.signal });
             const result = await response.json();
             
-            const container = document.getElementById('messagesContainer');
-            const messageDiv = document.createElement('div');
-            messageDiv.className = 'message assistant';
-            
-            const time = new Date().toLocaleTimeString();
-            let content = `
-                <div class="message-header">
-                    <span class="icon">🔌</span>
-                    <span class="name">Connection Test</span>
-                    <span class="time">${time}</span>
-                </div>
-                <div class="message-content">
-                    <h4>Power BI Connection Test Results</h4>
-            `;
+            const messageDiv = createMessage('assistant', '🔌', 'Connection Test');
+            const frag = document.createDocumentFragment();
+            frag.appendChild(el('h4', null, 'Power BI Connection Test Results'));
             
             if (result.test_results && result.test_results.test_steps) {
-                result.test_results.test_steps.forEach(step => {
-                    const icon = step.success ? '✅' : '❌';
-                    content += `
-                        <div style="margin: 0.5rem 0;">
-                            <strong>${icon} ${step.step}:</strong> ${step.details}
-                        </div>
-                    `;
-                });
+                const steps = result.test_results.test_steps;
+                for (let i = 0; i < steps.length; i++) {
+                    const step = steps[i];
+                    const line = el('div', 'test-step');
+                    line.append(el('strong', null, `${step.success ? '✅' : '❌'} ${step.step}:`), ` ${step.details}`);
+                    frag.appendChild(line);
+                }
             }
             
-            if (result.ready) {
-                content += '<p style="margin-top: 1rem; color: #10b981;">✅ Power BI is ready to use!</p>';
-            } else {
-                content += '<p style="margin-top: 1rem; color: #ef4444;">❌ Power BI configuration needs attention.</p>';
-            }
+            frag.appendChild(result.ready
+                ? el('p', 'test-status ready', '✅ Power BI is ready to use!')
+                : el('p', 'test-status not-ready', '❌ Power BI configuration needs attention.'));
             
-            content += '</div>';
-            messageDiv.innerHTML = content;
-            container.appendChild(messageDiv);
-            container.scrollTop = container.scrollHeight;
+            messageDiv.lastElementChild.appendChild(frag);
+            appendMessage(messageDiv);
             
         } catch (error) {
-            showError('Connection test failed: ' + error.message);
+            if (error.name !== 'AbortError') {
+                showError('Connection test failed: ' + error.message);
+            }
         } finally {
-            hideLoading();
+            if (connectionTestAbort === controller) {
+                connectionTestAbort = null;
+                hideLoading();
+            }
         }
     }
+    '''
 
-    function escapeHtml(text) {
-        const div = document.createElement('div');
-        div.textContent = text;
-        return div.innerHTML;
-    }
-    '''
\ No newline at end of file
+# The page is fully static, so render it once at import time. The CSS and
+# JS are served as separate long-cached assets under content-hashed names.
+_CRITICAL_CSS = _minify_css(_build_critical_css())
+_ANALYST_CSS = _minify_css(_build_analyst_css())
+_ANALYST_JS = _minify_js(_build_analyst_javascript())
+ANALYST_CSS_VERSION = _content_hash(_ANALYST_CSS)
+ANALYST_JS_VERSION = _content_hash(_ANALYST_JS)
+ANALYST_CSS_PATH = f'/analyst/static/analyst.{ANALYST_CSS_VERSION}.css'
+ANALYST_JS_PATH = f'/analyst/static/analyst.{ANALYST_JS_VERSION}.js'
+_ANALYST_HTML = _build_analyst_html()
+ANALYST_HTML_VERSION = _content_hash(_ANALYST_HTML)
+
+def get_analyst_html():
+    """Return the cached Power BI Analyst HTML interface"""
+    return _ANALYST_HTML
+
+def get_analyst_css():
+    """Return the cached CSS styles for the analyst interface"""
+    return _ANALYST_CSS
+
+def get_analyst_javascript():
+    """Return the cached JavaScript code for the analyst interface"""
+    return _ANALYST_JS
@@ -7,8 +7,11 @@ Better error handling and module loading diagnostics
 
 import os
 import json
+import queue
+import atexit
 import asyncio
 import logging
+import logging.handlers
 from datetime import datetime
 from typing import Dict, Any, Optional
 import sys
@@ -19,10 +22,19 @@ from aiohttp import web
 from aiohttp.web import Request, Response, json_response, middleware
 import aiohttp
 
-# Configure logging
+# Configure logging. Records are only queued on the calling thread; a background
+# listener formats and writes them, so logging never blocks the event loop.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+LOG_LISTENER = logging.handlers.QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(message)s',
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 